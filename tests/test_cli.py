@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import translate_gemma
+from tools import cli, fake_ollama
+
+LANGS = ['Hindi', 'Tamil']
+DOCUMENT = ' '.join(f'Sentence {i} talks about the river and the hills.' for i in range(12))
+
+
+@pytest.fixture
+def fake_host():
+    server, fake = fake_ollama.serve(port=0)
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def translate(tmp_path, host, name, *flags):
+    batch = tmp_path / 'batch.json'
+    batch.write_text(json.dumps({'sequence': LANGS, 'items': [{'text': DOCUMENT}]}), encoding='utf-8')
+    out = tmp_path / f'{name}.json'
+    status = cli.main(['translate', str(batch), '-o', str(out), '--hosts', host, '--no-cache', '--no-warmup',
+                       '--no-budget', *flags])
+    assert status == 0
+    return json.loads(out.read_text(encoding='utf-8'))[0]
+
+
+def test_translate_runs_do_not_leak_into_each_other(tmp_path, fake_host):
+    first = translate(tmp_path, fake_host, 'first', '--document', '120', '-j', '3', '--stream')
+    assert translate_gemma.document_chars == 120 and translate_gemma.concurrency == 3
+    assert not translate_gemma._segment_memo
+
+    second = translate(tmp_path, fake_host, 'second')
+    assert translate_gemma.document_chars == translate_gemma.DOCUMENT_CHARS
+    assert translate_gemma.concurrency == translate_gemma.CONCURRENCY
+    assert translate_gemma.streaming == translate_gemma.STREAM
+    assert second['translation'] == first['translation']
+
+
+def test_cascade_run_after_document_run_sees_its_cells(tmp_path, fake_host):
+    translate(tmp_path, fake_host, 'first', '--document', '120')
+    translate(tmp_path, fake_host, 'second', '--document', '120', '--cascade-model', 'translategemma:12b')
+    # every chunk of the second run went through the cascade instead of a finished future of the first
+    assert translate_gemma.cascade_stats['cells'] > len(LANGS)
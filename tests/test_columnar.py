@@ -0,0 +1,17 @@
+import sys
+
+import pytest
+
+import translate_gemma
+
+
+def test_parquet_output_without_pyarrow_fails_at_startup(monkeypatch, capsys):
+    # a None entry makes `import pyarrow` raise ImportError
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    monkeypatch.setitem(sys.modules, 'pyarrow.parquet', None)
+    with pytest.raises(SystemExit) as exc:
+        translate_gemma.parse_args(['batch.json', '-o', 'out.parquet'])
+    assert exc.value.code == 2
+    assert 'requirements-parquet.txt' in capsys.readouterr().err
+    # JSON outputs never need it
+    assert translate_gemma.parse_args(['batch.json', '-o', 'out.json']).output == 'out.json'
@@ -0,0 +1,31 @@
+import pytest
+
+sacrebleu = pytest.importorskip('sacrebleu')
+pytest.importorskip('pandas')
+
+from tools.evaluation import corpus_scores, metric_signature, score_segments
+from tools.score_store import ScoreStore
+
+SOURCES = ['Where is the nearest hospital?', 'The train leaves at noon.', 'Please close the door.',
+           'We walked along the river until dark.']
+CANDS = ['निकटतम अस्पताल कहाँ है?', 'ट्रेन दोपहर को निकलती है।', 'कृपया दरवाज़ा बंद करो।', 'हम अँधेरा होने तक नदी के किनारे चले।']
+REFS = ['सबसे नज़दीकी अस्पताल कहाँ है?', 'ट्रेन दोपहर में छूटती है।', 'कृपया दरवाज़ा बंद कीजिए।',
+        'हम अंधेरा होने तक नदी के किनारे-किनारे चलते रहे।']
+
+
+def test_stored_statistics_reproduce_sacrebleu(tmp_path):
+    segments = score_segments('Hindi', SOURCES, CANDS, REFS)
+    # round-trip through the store, as a resumed evaluation does
+    store = ScoreStore(tmp_path / 'scores.sqlite', metric_signature())
+    keys = [ScoreStore.make_key(s, c, 'Hindi', r) for s, c, r in zip(SOURCES, CANDS, REFS)]
+    store.put_many(dict(zip(keys, segments)))
+    stored = store.get_many(keys)
+    store.close()
+    segments = [stored[key] for key in keys]
+
+    bleu, chrf = corpus_scores(segments)
+    assert bleu == pytest.approx(sacrebleu.corpus_bleu(CANDS, [REFS]).score)
+    assert chrf == pytest.approx(sacrebleu.corpus_chrf(CANDS, [REFS]).score)
+    for seg, cand, ref in zip(segments, CANDS, REFS):
+        assert seg['bleu'] == round(sacrebleu.sentence_bleu(cand, [ref]).score, 2)
+        assert seg['chrf'] == round(sacrebleu.sentence_chrf(cand, [ref]).score, 2)
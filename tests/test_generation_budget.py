@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import translate_gemma
+from tools import fake_ollama
+
+LANGS = ['Malayalam', 'Kannada', 'Tamil', 'Telugu', 'Hindi']
+# about 1000 characters; the fake backend answers with one token per 4 characters
+SOURCE = ' '.join(f'Sentence {i} talks about the river and the hills.' for i in range(20))
+
+
+@pytest.fixture
+def fake_host():
+    server, fake = fake_ollama.serve(port=0)
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def run(tmp_path, host, output_ratio):
+    """Translate SOURCE with a learned output ratio that makes the first num_predict too small."""
+    budget = tmp_path / 'budget.json'
+    samples = {'output': [output_ratio] * 5, 'prompt': [0.3] * 5}
+    budget.write_text(json.dumps({'version': 1, 'langs': {L: samples for L in LANGS}}), encoding='utf-8')
+    batch = tmp_path / 'batch.json'
+    batch.write_text(json.dumps({'sequence': LANGS, 'items': [{'text': SOURCE}]}), encoding='utf-8')
+    out = tmp_path / 'out.json'
+    translate_gemma.main([str(batch), '-o', str(out), '--hosts', host, '--no-cache', '--no-warmup',
+                          '--budget-path', str(budget), '--retry-budget', '0'])
+    return json.loads(out.read_text(encoding='utf-8'))[0], json.loads(budget.read_text(encoding='utf-8'))
+
+
+def test_cut_off_reply_is_resent_with_a_bigger_budget(tmp_path, fake_host):
+    # num_predict 160 (640 characters) is cut off; the retry with 320 tokens completes
+    rec, budget = run(tmp_path, fake_host, 0.08)
+    assert 'errors' not in rec
+    assert rec['translation']['Tamil'] == fake_ollama.fake_translate(SOURCE, 'Tamil')
+    # the complete reply is learned from
+    assert len(budget['langs']['Tamil']['output']) == 6
+
+
+def test_reply_cut_off_twice_fails_the_cell(tmp_path, fake_host):
+    # num_predict 100, then 200 tokens: both are cut off
+    rec, _ = run(tmp_path, fake_host, 0.05)
+    assert rec['translation']['Tamil'] == ''
+    assert rec['errors']['Tamil']['status'] == 'truncated'
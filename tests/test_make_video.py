@@ -0,0 +1,11 @@
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def test_import_loads_no_renderers():
+    # a fresh interpreter: the test session may have imported them already
+    code = "import sys, tools.make_video; print(sorted(m for m in ('PIL', 'TTS', 'gtts') if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
@@ -0,0 +1,23 @@
+import re
+
+from tools.postprocess import collapse_repeats
+
+
+def legacy(text):
+    # the regex cleanup collapse_repeats replaced
+    text = re.sub(r"(\b\w+\b)(?:\s+\1){2,}", r"\1", text, flags=re.IGNORECASE)
+    text = re.sub(r"((?:\b\w+\b\s+){2,}\b\w+\b)(?:\s+\1){1,}", r"\1", text, flags=re.IGNORECASE)
+    return text
+
+
+def test_capitalized_repeat_keeps_the_first_copy_like_the_regexes():
+    for text in ['The altar of indignation the altar of indignation the altar of indignation.',
+                 'Nuance nuance nuance is lost.',
+                 'He said: Never again never again never again, and left.',
+                 'नमस्ते दुनिया नमस्ते दुनिया नमस्ते दुनिया']:
+        assert collapse_repeats(text) == legacy(text), text
+
+
+def test_repeated_sentences_are_kept():
+    for text in ['Stop. Stop. Stop.', 'I am here. I am here.']:
+        assert collapse_repeats(text) == text
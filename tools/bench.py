@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Benchmark the translation pipeline against the deterministic fake Ollama backend.
+
+    python tools/bench.py --items 500 --latency 0.05 --token-rate 200 --echo-rate 0.05
+    python tools/bench.py --scenarios sequential,concurrent --compare
+
+Builds a corpus from my-docs/benchmark_sentences.txt, runs each scenario through
+translate_gemma.main() (or translate_item directly) in-process, and reports
+items/sec, p50/p95/p99 latency per language, validation retries and peak memory.
+Results are appended to bench_results.jsonl with the current git commit so runs
+can be compared across commits (--compare).
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import translate_gemma
+from tools import fake_ollama
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SENTENCES_PATH = ROOT / 'my-docs' / 'benchmark_sentences.txt'
+RESULTS_PATH = ROOT / 'bench_results.jsonl'
+LANGS = ['Malayalam', 'Kannada', 'Tamil', 'Telugu', 'Hindi']
+
+
+def load_sentences(path=SENTENCES_PATH):
+    """Benchmark sentences, skipping the 'Easy:'/'Hard:' style labels."""
+    sentences = []
+    for ln in Path(path).read_text(encoding='utf8').splitlines():
+        s = ln.strip()
+        if s and not s.endswith(':'):
+            sentences.append(s)
+    return sentences
+
+
+def make_corpus(n, sentences):
+    """n items cycling through the sentences; later cycles get a suffix so every item is distinct."""
+    items = []
+    for i in range(n):
+        text = sentences[i % len(sentences)]
+        cycle = i // len(sentences)
+        items.append({'id': f'bench-{i}', 'text': text if cycle == 0 else f'{text} ({cycle})'})
+    return items
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[idx]
+
+
+class LatencyRecorder:
+    """Wraps translate_gemma.translate_text to time every (item, language) translation."""
+
+    def __init__(self):
+        self.samples = {}
+        self._orig = translate_gemma.translate_text
+
+    def __enter__(self):
+        orig = self._orig
+
+        def timed(text, lang):
+            t0 = time.perf_counter()
+            try:
+                return orig(text, lang)
+            finally:
+                self.samples.setdefault(lang, []).append(time.perf_counter() - t0)
+
+        translate_gemma.translate_text = timed
+        return self
+
+    def __exit__(self, *exc):
+        translate_gemma.translate_text = self._orig
+
+    def summary(self):
+        return {
+            lang: {
+                'n': len(vals),
+                'p50_ms': round(percentile(vals, 50) * 1000, 2),
+                'p95_ms': round(percentile(vals, 95) * 1000, 2),
+                'p99_ms': round(percentile(vals, 99) * 1000, 2),
+            }
+            for lang, vals in sorted(self.samples.items())
+        }
+
+
+def write_input(items, path, jsonl=False):
+    sequence = ['Source'] + LANGS
+    with open(path, 'w', encoding='utf-8') as f:
+        if jsonl:
+            f.write(json.dumps({'sequence': sequence}) + '\n')
+            for item in items:
+                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+        else:
+            json.dump({'sequence': sequence, 'items': items}, f, ensure_ascii=False)
+
+
+def count_outputs(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return sum(1 for ln in f if ln.strip())
+        return len(json.load(f))
+
+
+def scenarios(concurrency):
+    j = str(concurrency)
+    return {
+        'sequential': {'argv': ['-j', '1', '--no-cache']},
+        'concurrent': {'argv': ['-j', j, '--no-cache']},
+        'grouped': {'argv': ['-j', j, '--group-size', '8', '--no-cache']},
+        'streaming': {'argv': ['-j', j, '--no-cache'], 'jsonl': True},
+        'cache-warm': {'argv': ['-j', j], 'warm_cache': True},
+        'translate_item': {'argv': ['-j', j, '--no-cache'], 'direct': True},
+    }
+
+
+def run_scenario(name, spec, items, workdir, trace_memory=False):
+    jsonl = spec.get('jsonl', False)
+    in_path = os.path.join(workdir, f'{name}.input.' + ('jsonl' if jsonl else 'json'))
+    out_path = os.path.join(workdir, f'{name}.output.' + ('jsonl' if jsonl else 'json'))
+    write_input(items, in_path, jsonl=jsonl)
+    argv = [in_path, '-o', out_path, '--cache-path', os.path.join(workdir, f'{name}.cache.sqlite'),
+            '--budget-path', os.path.join(workdir, f'{name}.budget.json')] + spec['argv']
+
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+    with devnull, contextlib.redirect_stdout(devnull):
+        if spec.get('warm_cache'):
+            translate_gemma.main(argv)
+        if trace_memory:
+            tracemalloc.start()
+        with LatencyRecorder() as rec:
+            t0 = time.perf_counter()
+            if spec.get('direct'):
+                args = translate_gemma.parse_args(argv)
+                translate_gemma.configure(args)
+                try:
+                    seq = ['Source'] + LANGS
+                    for item in items:
+                        translate_gemma.translate_item(item, targets=seq)
+                finally:
+                    translate_gemma.shutdown()
+                done = len(items)
+            else:
+                translate_gemma.main(argv)
+                done = count_outputs(out_path)
+            elapsed = time.perf_counter() - t0
+        if trace_memory:
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        elif resource is not None:
+            # ru_maxrss is KB on Linux, bytes on macOS; whole-process high-water mark
+            scale = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+        else:
+            peak_mb = None
+    return {
+        'items': done,
+        'seconds': round(elapsed, 3),
+        'items_per_sec': round(done / elapsed, 2) if elapsed else 0.0,
+        'retries': translate_gemma.retry_budget.used,
+        'peak_mb': None if peak_mb is None else round(peak_mb, 1),
+        'latency': rec.summary(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def load_results(path=RESULTS_PATH):
+    if not Path(path).exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+def print_result(rec, previous=None):
+    m = rec['metrics']
+    line = (f"{rec['scenario']:15s} {m['items']:6d} items  {m['items_per_sec']:9.2f} items/s  "
+            f"retries {m['retries']:4d}  peak {m['peak_mb']} MB")
+    if previous is not None:
+        prev = previous['metrics']['items_per_sec']
+        if prev:
+            line += f"  ({(m['items_per_sec'] - prev) / prev * 100:+.1f}% vs {previous.get('commit')})"
+    print(line)
+    for lang, st in m['latency'].items():
+        print(f"    {lang:10s} p50 {st['p50_ms']:8.1f} ms  p95 {st['p95_ms']:8.1f} ms  p99 {st['p99_ms']:8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark translate_gemma against a fake Ollama backend.')
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--scenarios', default='sequential,concurrent,grouped,streaming,cache-warm,translate_item')
+    parser.add_argument('-j', '--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02, help='fake per-request latency in seconds')
+    parser.add_argument('--token-rate', type=float, default=0.0, help='fake generated tokens per second (0 = instant)')
+    parser.add_argument('--echo-rate', type=float, default=0.0)
+    parser.add_argument('--repeat-rate', type=float, default=0.0)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='measure peak Python allocations with tracemalloc (slower) instead of process RSS')
+    parser.add_argument('--results', default=str(RESULTS_PATH), help='where results are appended (default %(default)s)')
+    parser.add_argument('--no-save', action='store_true', help='do not append results')
+    parser.add_argument('--compare', action='store_true', help='show change vs the previous run of each scenario')
+    args = parser.parse_args(argv)
+
+    fake_params = {'latency': args.latency, 'token_rate': args.token_rate,
+                   'echo_rate': args.echo_rate, 'repeat_rate': args.repeat_rate}
+    server, fake = fake_ollama.serve(port=0, **fake_params)
+    os.environ['OLLAMA_HOST'] = f'http://127.0.0.1:{server.server_address[1]}'
+    items = make_corpus(args.items, load_sentences())
+    history = load_results(args.results) if args.compare else []
+    specs = scenarios(args.concurrency)
+    commit = git_commit()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for name in [s.strip() for s in args.scenarios.split(',') if s.strip()]:
+                if name not in specs:
+                    print(f'Unknown scenario {name!r}; choose from {", ".join(specs)}')
+                    continue
+                metrics = run_scenario(name, specs[name], items, workdir, trace_memory=args.trace_memory)
+                params = dict(fake_params, items=args.items, concurrency=args.concurrency)
+                rec = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit,
+                       'scenario': name, 'params': params, 'metrics': metrics}
+                previous = None
+                for old in reversed(history):
+                    if old['scenario'] == name and old['params'] == params:
+                        previous = old
+                        break
+                print_result(rec, previous)
+                if not args.no_save:
+                    with open(args.results, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import json
+import math
+import os
+import threading
+
+# output tokens per source character, and prompt tokens per prompt character, until
+# enough requests for a language have been seen; both err on the generous side
+DEFAULT_OUTPUT_RATIO = 1.0
+DEFAULT_PROMPT_RATIO = 0.5
+# observations needed before the learned ratios replace the defaults
+MIN_SAMPLES = 5
+# recent observations kept per language (older ones age out)
+KEEP_SAMPLES = 200
+# headroom over the median ratio; the median is not pulled up by the occasional runaway
+# generation (which validation accepts once postprocess has collapsed the loop)
+MARGIN = 2.0
+MIN_PREDICT = 64
+# tokens the chat template adds around the messages
+TEMPLATE_TOKENS = 32
+MIN_CTX = 2048
+MAX_CTX = 8192
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)]
+
+
+class GenerationBudget:
+    """Per-request num_predict sized from the source and prompt length, under one num_ctx per run.
+
+    Expansion ratios (generated tokens per source character, prompt tokens per
+    prompt character) are learned per language from Ollama's eval_count and
+    prompt_eval_count and kept in a small JSON file, so each run starts from what
+    earlier runs observed. Ollama reloads the model whenever num_ctx changes, so
+    every request (and the warm-up) gets the same num_ctx: the power of two the
+    previous run needed. It only grows, a bucket at a time, when a request does
+    not fit; num_predict is what varies per request.
+    """
+
+    def __init__(self, path=None, min_ctx=MIN_CTX, max_ctx=MAX_CTX, margin=MARGIN):
+        self.path = path
+        self.min_ctx = min_ctx
+        self.max_ctx = max(min_ctx, max_ctx)
+        self.margin = margin
+        self.truncated = 0
+        self.ctx_used = {}
+        self.grown = 0
+        self._samples = {}
+        self._lock = threading.Lock()
+        saved_ctx = min_ctx
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                self._samples = saved.get('langs', {})
+                saved_ctx = int(saved.get('num_ctx') or min_ctx)
+            except (OSError, ValueError):
+                print(f'Generation budget: could not read {path}; starting from defaults')
+        self.num_ctx = self.bucket(saved_ctx)
+        # largest bucket a request of this run needed; the next run starts from it
+        self.needed_ctx = self.min_ctx
+
+    def bucket(self, tokens):
+        """Smallest power-of-two context from min_ctx holding `tokens`, capped at max_ctx."""
+        num_ctx = self.min_ctx
+        while num_ctx < tokens and num_ctx < self.max_ctx:
+            num_ctx *= 2
+        return min(num_ctx, self.max_ctx)
+
+    def ratio(self, lang, kind):
+        default = DEFAULT_OUTPUT_RATIO if kind == 'output' else DEFAULT_PROMPT_RATIO
+        with self._lock:
+            values = self._samples.get(lang, {}).get(kind, [])
+            if len(values) < MIN_SAMPLES:
+                return default
+            return percentile(values, 0.5)
+
+    def warmup_options(self):
+        """Options for the warm-up request, so the model is loaded with the run's context size."""
+        with self._lock:
+            return {'num_ctx': self.num_ctx}
+
+    def prompt_tokens(self, lang, prompt_chars):
+        return int(math.ceil(prompt_chars * self.ratio(lang, 'prompt') * 1.1)) + TEMPLATE_TOKENS
+
+    def _fit(self, need):
+        """The run's num_ctx, grown to the bucket holding `need` tokens if it does not fit yet."""
+        need = self.bucket(need)
+        with self._lock:
+            self.needed_ctx = max(self.needed_ctx, need)
+            if need > self.num_ctx:
+                # one reload now instead of one per request that needs the bigger context
+                self.num_ctx = need
+                self.grown += 1
+            num_ctx = self.num_ctx
+            self.ctx_used[num_ctx] = self.ctx_used.get(num_ctx, 0) + 1
+        return num_ctx
+
+    def options(self, lang, source_chars, prompt_chars):
+        """{'num_predict', 'num_ctx'} for one request."""
+        prompt_tokens = self.prompt_tokens(lang, prompt_chars)
+        num_predict = max(MIN_PREDICT, int(math.ceil(source_chars * self.ratio(lang, 'output') * self.margin)))
+        num_ctx = self._fit(prompt_tokens + num_predict)
+        # a long source on a capped context keeps what is left after the prompt
+        num_predict = max(MIN_PREDICT, min(num_predict, num_ctx - prompt_tokens))
+        return {'num_predict': num_predict, 'num_ctx': num_ctx}
+
+    def extend(self, lang, prompt_chars, options):
+        """Options for re-sending a reply cut off by num_predict: margin times the num_predict, within max_ctx.
+
+        Returns None when the context is already full and num_predict cannot grow.
+        """
+        prompt_tokens = self.prompt_tokens(lang, prompt_chars)
+        wanted = int(math.ceil(options['num_predict'] * self.margin))
+        num_ctx = self._fit(prompt_tokens + wanted)
+        num_predict = min(wanted, num_ctx - prompt_tokens)
+        if num_predict <= options['num_predict']:
+            return None
+        return dict(options, num_predict=num_predict, num_ctx=num_ctx)
+
+    def observe(self, lang, source_chars, prompt_chars, resp):
+        """Learn from a finished response; generations cut off by num_predict only count as truncated."""
+        if resp is None:
+            return
+        if resp.get('done_reason') == 'length':
+            with self._lock:
+                self.truncated += 1
+            return
+        eval_count = resp.get('eval_count')
+        prompt_count = resp.get('prompt_eval_count')
+        with self._lock:
+            lang_samples = self._samples.setdefault(lang, {'output': [], 'prompt': []})
+            if eval_count and source_chars:
+                lang_samples['output'].append(round(eval_count / source_chars, 4))
+                del lang_samples['output'][:-KEEP_SAMPLES]
+            # prompt_eval_count is lower than the prompt when Ollama reuses a cached prefix, so
+            # only counts that cover most of the estimate are taken as prompt size samples
+            if prompt_count and prompt_chars and prompt_count >= 0.2 * prompt_chars:
+                lang_samples['prompt'].append(round(max(0, prompt_count - TEMPLATE_TOKENS) / prompt_chars, 4))
+                del lang_samples['prompt'][:-KEEP_SAMPLES]
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            payload = {'version': 1, 'num_ctx': self.needed_ctx, 'langs': self._samples}
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def stats(self):
+        with self._lock:
+            return {'truncated': self.truncated, 'ctx_used': dict(sorted(self.ctx_used.items())), 'grown': self.grown,
+                    'learned': {lang: len(s.get('output', [])) for lang, s in self._samples.items()}}
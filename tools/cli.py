@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Single entry point for the pipeline steps.
+
+    python -m tools.cli translate batch.json --concurrency 4
+    python -m tools.cli score --jobs 4
+    python -m tools.cli qa batch_output.json --summary
+    python -m tools.cli export
+    python -m tools.cli video --jobs 3
+
+Each command imports its module only when it runs, so `qa` never loads the
+Ollama client and `translate` never loads sacrebleu, pandas or Pillow. The same
+steps can be run in-process, without a new interpreter per step:
+
+    from tools import cli
+    cli.translate('batch.json', '--concurrency', '4')
+    status = cli.qa('batch_output.json', '--max-issue-rate', '0.01')
+
+Profiling options go before the command and work for every step:
+
+    python -m tools.cli --profile [--profile-cprofile] [--profile-memory] [--profile-out PREFIX] score
+"""
+import importlib
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from tools import profiling
+
+# command -> (module with a main(argv) function, description)
+COMMANDS = {
+    'translate': ('translate_gemma', 'translate a batch with TranslateGemma via Ollama'),
+    'score': ('tools.evaluation', 'BLEU/chrF, QA and rater CSVs for batch_output.json'),
+    'qa': ('tools.qa_checks', 'QA checks over an output file'),
+    'export': ('tools.export_for_human', 'for_raters.csv for human scoring'),
+    'video': ('tools.make_video', 'per-language slide and narration videos'),
+}
+
+
+def usage():
+    lines = ['usage: python -m tools.cli <command> [options]', '', 'commands:']
+    lines += [f'  {name:<10} {desc}' for name, (_, desc) in COMMANDS.items()]
+    lines += ['', 'profiling (before the command):',
+              '  --profile            per-stage timings; sampled stacks in PREFIX.folded',
+              '  --profile-cprofile   also cProfile every thread (PREFIX.pstats)',
+              '  --profile-memory     also trace allocations (tracemalloc)',
+              '  --profile-out PREFIX dump path prefix (default <command>_profile)']
+    lines += ['', "Run 'python -m tools.cli <command> --help' for the options of a command."]
+    return '\n'.join(lines)
+
+
+def run(command, argv=()):
+    """Run one command in this process; returns its exit status (0 = success)."""
+    if command not in COMMANDS:
+        raise ValueError(f'unknown command {command!r} (choose from {", ".join(COMMANDS)})')
+    module = importlib.import_module(COMMANDS[command][0])
+    try:
+        status = module.main(list(argv))
+    except SystemExit as e:
+        status = e.code
+        if isinstance(status, str):
+            print(status, file=sys.stderr)
+    if status is None:
+        return 0
+    return status if isinstance(status, int) else 1
+
+
+def translate(*argv):
+    return run('translate', argv)
+
+
+def score(*argv):
+    return run('score', argv)
+
+
+def qa(*argv):
+    return run('qa', argv)
+
+
+def export(*argv):
+    return run('export', argv)
+
+
+def video(*argv):
+    return run('video', argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    profile = {}
+    while argv and argv[0].startswith('--profile'):
+        opt = argv.pop(0)
+        if opt == '--profile-out':
+            if not argv:
+                print('--profile-out needs a PREFIX', file=sys.stderr)
+                return 2
+            profile['out'] = argv.pop(0)
+        else:
+            profile[opt[2:].replace('-', '_')] = True
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0 if argv else 2
+    if argv[0] not in COMMANDS:
+        print(f'unknown command: {argv[0]}\n\n{usage()}', file=sys.stderr)
+        return 2
+    if not profile:
+        return run(argv[0], argv[1:])
+    profiling.start(cprofile=profile.get('profile_cprofile', False), memory=profile.get('profile_memory', False))
+    try:
+        # the command's own stages nest inside; this row's self time is the uninstrumented rest
+        with profiling.stage('command'):
+            return run(argv[0], argv[1:])
+    finally:
+        profiling.stop(profile.get('out', f'{argv[0]}_profile'))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
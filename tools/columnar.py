@@ -0,0 +1,178 @@
+"""Columnar (Parquet) output files: one row per item, one column per language.
+
+Besides the language columns, every file has
+
+    id         the item's "id" (as a string), if it has one
+    text       the item's source text
+    translate  False for items marked meta.translate == False
+    input      the whole input item as JSON
+    errors     the record's "errors" entry as JSON, if any
+    tiers      the record's "tiers" entry as JSON, if any
+
+Rows are written in row groups while a run progresses, so memory stays flat,
+and readers memory-map the file and decode only the columns they ask for:
+scoring one language of a 100k-item run never parses the other languages or
+the input JSON. Needs pyarrow (pip install -r requirements-parquet.txt);
+JSON/JSONL outputs work without it.
+"""
+import json
+import os
+
+SUFFIXES = ('.parquet', '.pq')
+# rows per row group; a reader touching a few items only decodes their groups
+ROW_GROUP = int(os.environ.get('TRANSLATE_ROW_GROUP', '1000'))
+META_COLUMNS = ['id', 'text', 'translate', 'input', 'errors', 'tiers']
+
+
+def is_columnar(path):
+    return str(path).lower().endswith(SUFFIXES)
+
+
+def arrow():
+    """(pyarrow, pyarrow.parquet), imported on first use so JSON-only runs never load them."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('Parquet output needs pyarrow. Install with: pip install -r requirements-parquet.txt') from None
+    return pyarrow, pyarrow.parquet
+
+
+def item_text(item):
+    if not isinstance(item, dict):
+        return item if isinstance(item, str) else ''
+    return item.get('text') or item.get('content') or item.get('source') or ''
+
+
+def _json_or_none(value):
+    return json.dumps(value, ensure_ascii=False) if value else None
+
+
+class OutputWriter:
+    """Appends output records ({'input', 'translation', 'errors'?, 'tiers'?}) to a Parquet file.
+
+    The file is written under a temporary name and moved into place by close(), so an
+    interrupted run never leaves a truncated file (the footer is only written at the end).
+    """
+
+    def __init__(self, path, langs, row_group=ROW_GROUP):
+        pa, pq = arrow()
+        self._pa = pa
+        self.path = str(path)
+        self.langs = [L for L in dict.fromkeys(langs) if L not in META_COLUMNS]
+        self.row_group = max(1, row_group)
+        self.written = 0
+        self.schema = pa.schema([('id', pa.string()), ('text', pa.string()), ('translate', pa.bool_()),
+                                 ('input', pa.string())]
+                                + [(L, pa.string()) for L in self.langs]
+                                + [('errors', pa.string()), ('tiers', pa.string())])
+        self._tmp = f'{self.path}.tmp'
+        self._writer = pq.ParquetWriter(self._tmp, self.schema, compression='zstd')
+        self._rows = []
+
+    def write(self, rec):
+        self._rows.append(rec)
+        if len(self._rows) >= self.row_group:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        inputs = [rec.get('input') for rec in self._rows]
+        translations = [rec.get('translation') or {} for rec in self._rows]
+        columns = {
+            'id': [str(it['id']) if isinstance(it, dict) and it.get('id') is not None else None for it in inputs],
+            'text': [item_text(it) for it in inputs],
+            'translate': [not (isinstance(it, dict) and (it.get('meta') or {}).get('translate') is False)
+                          for it in inputs],
+            'input': [json.dumps(it, ensure_ascii=False) for it in inputs],
+            'errors': [_json_or_none(rec.get('errors')) for rec in self._rows],
+            'tiers': [_json_or_none(rec.get('tiers')) for rec in self._rows],
+        }
+        for L in self.langs:
+            columns[L] = [tr.get(L) for tr in translations]
+        self._writer.write_table(self._pa.table(columns, schema=self.schema))
+        self.written += len(self._rows)
+        self._rows = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        """Close without publishing; the partial file is removed."""
+        self._writer.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_records(path, records, langs=None):
+    """Write a list of output records in one go (languages default to those the records use)."""
+    if langs is None:
+        langs = list(dict.fromkeys(L for rec in records for L in (rec.get('translation') or {})))
+    with OutputWriter(path, langs) as w:
+        for rec in records:
+            w.write(rec)
+
+
+def languages(path):
+    """Language columns of a Parquet output, in file order (read from the footer only)."""
+    _, pq = arrow()
+    return [name for name in pq.read_schema(path).names if name not in META_COLUMNS]
+
+
+def read_columns(path, columns, translated_only=False):
+    """{column: list of values} for the requested columns only, read through a memory map.
+
+    Columns missing from the file come back as all-None. With translated_only, rows
+    whose item is marked meta.translate == False are dropped.
+    """
+    _, pq = arrow()
+    names = set(pq.read_schema(path).names)
+    wanted = [c for c in dict.fromkeys(columns) if c in names]
+    if translated_only and 'translate' not in wanted:
+        wanted.append('translate')
+    table = pq.read_table(path, columns=wanted, memory_map=True)
+    if translated_only:
+        table = table.filter(table.column('translate'))
+    n = table.num_rows
+    return {c: table.column(c).to_pylist() if c in names else [None] * n for c in columns}
+
+
+def read_outputs(path, langs=None, translated_only=False):
+    """Output records reading only the text and `langs` columns (all languages if None).
+
+    The records have 'input': {'text': ...} and 'translation' with the selected languages,
+    which is what the evaluation tools use; read_records() restores the full records.
+    """
+    if langs is None:
+        langs = languages(path)
+    cols = read_columns(path, ['text'] + list(langs), translated_only)
+    return [{'input': {'text': text or ''},
+             'translation': {L: cols[L][i] for L in langs if cols[L][i] is not None}}
+            for i, text in enumerate(cols['text'])]
+
+
+def read_records(path):
+    """Full output records (input item, every language, errors and tiers), e.g. for --retry-failed."""
+    langs = languages(path)
+    cols = read_columns(path, ['input', 'errors', 'tiers'] + langs)
+    records = []
+    for i, raw in enumerate(cols['input']):
+        rec = {'input': json.loads(raw),
+               'translation': {L: cols[L][i] for L in langs if cols[L][i] is not None}}
+        for extra in ('errors', 'tiers'):
+            if cols[extra][i]:
+                rec[extra] = json.loads(cols[extra][i])
+        records.append(rec)
+    return records
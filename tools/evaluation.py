@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""One-pass evaluation engine for batch_output.json (or batch_output.parquet).
+
+Loads the outputs and every refs/<lang>.txt once, scores all languages in
+parallel worker processes (per-segment and corpus BLEU/chrF plus QA checks),
+and writes every CSV the individual tools produce:
+
+    auto_scores.csv        (tools/evaluate_auto.py)
+    auto_scores_rated.csv  (tools/map_auto_scores.py)
+    scoring_display.csv    (tools/score_display.py)
+    for_raters.csv         (tools/export_for_human.py)
+    segment_scores.csv     per-segment scores and QA issues
+
+Segment results (with BLEU/chrF sufficient statistics) are kept in
+.eval_scores.sqlite, so a re-run only scores segments whose output or
+reference changed and derives the corpus scores from the stored statistics.
+
+    python tools/evaluation.py [--outputs batch_output.json] [--jobs N]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from tools import columnar, profiling
+from tools.qa_checks import issue_lists, qa_batch
+from tools.score_store import ScoreStore
+
+ALL_LANGS = ['Malayalam', 'Kannada', 'Tamil', 'Telugu', 'Hindi']
+# languages each legacy CSV covers
+AUTO_LANGS = ['Malayalam', 'Kannada', 'Tamil', 'Telugu']
+DISPLAY_LANGS = ['Malayalam', 'Kannada', 'Tamil', 'Telugu', 'Hindi']
+RATER_LANGS = ['Malayalam', 'Kannada', 'Tamil', 'Telugu']
+
+STORE_PATH = ROOT / '.eval_scores.sqlite'
+# bump when segment scoring or the QA checks change, so stored segment scores are recomputed
+SCORE_VERSION = 1
+
+DISPLAY_FIELDS = ['language', 'BLEU', 'chrF', 'meaning_1_5', 'completeness_1_5', 'fluency_1_5', 'register_1_5',
+                  'metaphor_1_5', 'grammar_1_5', 'human_proxy_mean', 'qa_issues']
+
+
+def default_outputs():
+    """batch_output.json, or batch_output.parquet when that is the more recent run."""
+    paths = [p for p in (ROOT / 'batch_output.json', ROOT / 'batch_output.parquet') if p.exists()]
+    if not paths:
+        return ROOT / 'batch_output.json'
+    return max(paths, key=lambda p: p.stat().st_mtime)
+
+
+def load_outputs(path, langs=None):
+    """Translated entries from batch_output.json, without items marked meta.translate == False.
+
+    A Parquet output (tools/columnar.py) is memory-mapped and only its source text and
+    `langs` columns are read; JSON outputs are parsed whole.
+    """
+    if columnar.is_columnar(path):
+        return columnar.read_outputs(path, langs, translated_only=True)
+    raw = json.loads(Path(path).read_text(encoding='utf8'))
+    return [d for d in raw if d.get('input', {}).get('meta', {}).get('translate', True) is not False]
+
+
+def load_refs(refs_dir, langs=ALL_LANGS):
+    """Non-empty reference lines per language; languages without a refs file are left out."""
+    refs = {}
+    for L in langs:
+        ref_file = Path(refs_dir) / f"{L.lower()}.txt"
+        if ref_file.exists():
+            refs[L] = [l.rstrip('\n') for l in ref_file.read_text(encoding='utf8').splitlines() if l.strip() != '']
+    return refs
+
+
+def chrF_to_1_5(ch):
+    try:
+        ch = float(ch)
+    except Exception:
+        return 1
+    if ch >= 60:
+        return 5
+    if ch >= 50:
+        return 4
+    if ch >= 40:
+        return 3
+    if ch >= 30:
+        return 2
+    return 1
+
+
+def metric_signature():
+    """Identifies the metric configuration; stored segment scores are only reused under the same one."""
+    import sacrebleu
+
+    # BLEU/chrF run with sacrebleu's defaults, so its version pins the configuration
+    return f'{SCORE_VERSION}|sacrebleu {sacrebleu.__version__}'
+
+
+def score_segments(lang, sources, cands, refs):
+    """Segment entries for aligned sources/candidates/references (runs in a worker process).
+
+    Each entry has sentence BLEU/chrF, their sufficient statistics (summed for the
+    corpus scores), the length ratio and the QA issues.
+    """
+    from sacrebleu.metrics import BLEU, CHRF
+
+    bleu, sentence_bleu, chrf = BLEU(), BLEU(effective_order=True), CHRF()
+    bleu_stats = bleu._extract_corpus_statistics(cands, [refs])
+    chrf_stats = chrf._extract_corpus_statistics(cands, [refs])
+    qa = issue_lists(qa_batch(sources, cands, lang))
+    segments = []
+    for i, (cand, ref) in enumerate(zip(cands, refs)):
+        segments.append({
+            'bleu': round(sentence_bleu._compute_score_from_stats(bleu_stats[i]).score, 2),
+            'chrf': round(chrf._compute_score_from_stats(chrf_stats[i]).score, 2),
+            'bleu_stats': [int(v) for v in bleu_stats[i]],
+            'chrf_stats': [int(v) for v in chrf_stats[i]],
+            'length_ratio': (len(cand) / max(1, len(ref))) if ref else 0,
+            'qa_issues': qa[i],
+        })
+    return segments
+
+
+def corpus_scores(segments):
+    """Corpus BLEU and chrF from the summed segment statistics (same as sacrebleu.corpus_bleu/corpus_chrf)."""
+    from sacrebleu.metrics import BLEU, CHRF
+
+    if not segments:
+        return 0.0, 0.0
+    bleu, chrf = BLEU(), CHRF()
+    bleu_total = [sum(col) for col in zip(*(s['bleu_stats'] for s in segments))]
+    chrf_total = [sum(col) for col in zip(*(s['chrf_stats'] for s in segments))]
+    return bleu._compute_score_from_stats(bleu_total).score, chrf._compute_score_from_stats(chrf_total).score
+
+
+def evaluate(data, refs, langs=ALL_LANGS, jobs=None, store=None):
+    """Score every language that has references; returns {lang: result}. jobs=1 runs in-process.
+
+    Segments are aligned by position and truncated to the shorter of candidates/references;
+    `aligned` records whether the counts matched. With a ScoreStore, only segments whose
+    output or reference changed are scored; the rest come from the store.
+    """
+    sources = [d.get('input', {}).get('text', '') for d in data]
+    results, tasks, pending = {}, [], {}
+    for L in langs:
+        if L not in refs:
+            continue
+        cands = [item.get('translation', {}).get(L, '').strip() for item in data]
+        n = min(len(refs[L]), len(cands))
+        results[L] = {
+            'lang': L, 'n': n, 'n_refs': len(refs[L]), 'n_cands': len(cands),
+            'aligned': len(refs[L]) == len(cands), 'segments': [None] * n,
+        }
+        keys = [ScoreStore.make_key(sources[i], cands[i], L, refs[L][i]) for i in range(n)]
+        found = {}
+        if store is not None:
+            with profiling.stage('store'):
+                found = store.get_many(keys)
+        missing = [i for i in range(n) if keys[i] not in found]
+        for i in range(n):
+            if keys[i] in found:
+                results[L]['segments'][i] = found[keys[i]]
+        if missing:
+            pending[L] = (missing, keys)
+            tasks.append((L, [sources[i] for i in missing], [cands[i] for i in missing], [refs[L][i] for i in missing]))
+
+    jobs = jobs or min(len(tasks), os.cpu_count() or 1)
+    with profiling.stage('segments'):
+        if jobs <= 1 or len(tasks) <= 1:
+            scored = [score_segments(*t) for t in tasks]
+        else:
+            # imported here: a warm store never needs worker processes
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                scored = list(pool.map(score_segments, *zip(*tasks)))
+
+    new_entries = {}
+    for (L, *_), segments in zip(tasks, scored):
+        missing, keys = pending[L]
+        for i, seg in zip(missing, segments):
+            results[L]['segments'][i] = seg
+            new_entries[keys[i]] = seg
+    if store is not None and new_entries:
+        with profiling.stage('store'):
+            store.put_many(new_entries)
+
+    for res in results.values():
+        res['bleu'], res['chrf'] = corpus_scores(res['segments'])
+    return results
+
+
+def open_store(path=STORE_PATH):
+    """The segment score store used by the evaluation tools (None if path is empty)."""
+    return ScoreStore(path, metric_signature()) if path else None
+
+
+def auto_rows(results, langs=AUTO_LANGS):
+    """Rows of auto_scores.csv: corpus BLEU/chrF for languages whose line counts match."""
+    return [{'lang': L, 'BLEU': round(results[L]['bleu'], 2), 'chrF': round(results[L]['chrf'], 2)}
+            for L in langs if L in results and results[L]['aligned']]
+
+
+def display_row(res):
+    """One scoring_display.csv row: proxy 1-5 human scores derived from chrF, length ratio and QA."""
+    meaning = chrF_to_1_5(res['chrf'])
+
+    # completeness: length ratio average
+    ratios = [s['length_ratio'] for s in res['segments']]
+    avg_ratio = sum(ratios) / len(ratios) if ratios else 0
+    if avg_ratio >= 0.95:
+        completeness = 5
+    elif avg_ratio >= 0.90:
+        completeness = 4
+    elif avg_ratio >= 0.80:
+        completeness = 3
+    elif avg_ratio >= 0.60:
+        completeness = 2
+    else:
+        completeness = 1
+
+    # QA checks aggregated per language
+    qa_issues = list(set(issue for s in res['segments'] for issue in s['qa_issues']))
+
+    # fluency heuristic: if PROMPT_LEAKAGE or ENGLISH_WORDS_PRESENT -> low
+    if 'PROMPT_LEAKAGE' in qa_issues or 'ENGLISH_WORDS_PRESENT' in qa_issues:
+        fluency = 2
+    else:
+        # use chrF as proxy for fluency too
+        fluency = meaning if meaning >= 3 else 3
+
+    # register & tone, metaphor handling: approximate by chrF mapping
+    register = meaning
+    metaphor = meaning
+
+    # grammar: penalize if many English words or odd punctuation
+    if 'ENGLISH_WORDS_PRESENT' in qa_issues:
+        grammar = max(1, meaning - 1)
+    else:
+        grammar = min(5, meaning + 0)
+
+    human_proxy_mean = round((meaning + completeness + fluency + register + metaphor + grammar) / 6, 2)
+    return {
+        'language': res['lang'],
+        'BLEU': round(res['bleu'], 2),
+        'chrF': round(res['chrf'], 2),
+        'meaning_1_5': meaning,
+        'completeness_1_5': completeness,
+        'fluency_1_5': fluency,
+        'register_1_5': register,
+        'metaphor_1_5': metaphor,
+        'grammar_1_5': grammar,
+        'human_proxy_mean': human_proxy_mean,
+        'qa_issues': ';'.join(qa_issues),
+    }
+
+
+def rater_rows(data, refs, langs=RATER_LANGS):
+    """Rows of for_raters.csv: one per item and language with source, reference and candidate."""
+    rows = []
+    for idx, item in enumerate(data):
+        src = item.get('input', {}).get('text', '').strip()
+        for L in langs:
+            ref_lines = refs.get(L, [])
+            ref_line = ref_lines[idx].strip() if idx < len(ref_lines) else ''
+            cand = item.get('translation', {}).get(L, '').strip()
+            rows.append({'id': f'{idx+1}', 'language': L, 'source': src, 'reference': ref_line, 'candidate': cand})
+    return rows
+
+
+def segment_rows(results):
+    rows = []
+    for L, res in results.items():
+        for i, s in enumerate(res['segments']):
+            rows.append({'id': i + 1, 'language': L, 'BLEU': s['bleu'], 'chrF': s['chrf'],
+                         'length_ratio': round(s['length_ratio'], 3), 'qa_issues': ';'.join(s['qa_issues'])})
+    return rows
+
+
+def write_csv(path, fieldnames, rows):
+    with profiling.stage('write'), open(path, 'w', newline='', encoding='utf8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for r in rows:
+            writer.writerow(r)
+    print('Wrote', path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score batch_output.json for all languages in one pass.')
+    parser.add_argument('--outputs', default=str(default_outputs()),
+                        help='batch_output.json or a Parquet output (default: the more recent of the two)')
+    parser.add_argument('--refs', default=str(ROOT / 'refs'))
+    parser.add_argument('--out-dir', default=str(ROOT))
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: one per language, up to CPU count)')
+    parser.add_argument('--store', default=str(STORE_PATH), help='segment score store (default %(default)s)')
+    parser.add_argument('--no-store', action='store_true', help='score every segment from scratch')
+    args = parser.parse_args(argv)
+
+    if not Path(args.outputs).exists():
+        print(f'{args.outputs} not found')
+        raise SystemExit(1)
+    try:
+        import sacrebleu  # noqa: F401
+    except Exception:
+        print('sacrebleu not installed. Install with: pip install sacrebleu')
+        raise SystemExit(1)
+
+    with profiling.stage('load'):
+        data = load_outputs(args.outputs, ALL_LANGS)
+        refs = load_refs(args.refs)
+    store = None if args.no_store else open_store(args.store)
+    try:
+        with profiling.stage('score'):
+            results = evaluate(data, refs, jobs=args.jobs, store=store)
+    finally:
+        if store is not None:
+            st = store.stats()
+            print(f"Score store: {st['hits']} segments reused, {st['misses']} scored ({st['entries']} stored)")
+            store.close()
+    for L in ALL_LANGS:
+        if L not in refs:
+            print(f'No reference for {L}; skipping')
+        elif not results[L]['aligned']:
+            print(f"Length mismatch for {L}: refs {results[L]['n_refs']} vs cands {results[L]['n_cands']}; "
+                  'truncated to min (excluded from auto_scores.csv)')
+
+    out = Path(args.out_dir)
+    auto = auto_rows(results)
+    if auto:
+        write_csv(out / 'auto_scores.csv', ['lang', 'BLEU', 'chrF'], auto)
+        write_csv(out / 'auto_scores_rated.csv', ['lang', 'BLEU', 'chrF', 'chrF_1to5'],
+                  [dict(r, chrF_1to5=chrF_to_1_5(r['chrF'])) for r in auto])
+    else:
+        print('No automatic scores computed.')
+    display = [display_row(results[L]) for L in DISPLAY_LANGS if L in results]
+    write_csv(out / 'scoring_display.csv', DISPLAY_FIELDS, display)
+    write_csv(out / 'for_raters.csv', ['id', 'language', 'source', 'reference', 'candidate'], rater_rows(data, refs))
+    write_csv(out / 'segment_scores.csv', ['id', 'language', 'BLEU', 'chrF', 'length_ratio', 'qa_issues'],
+              segment_rows(results))
+
+    print('\nSummary:')
+    for r in display:
+        print(f"{r['language']}: BLEU={r['BLEU']:.2f} chrF={r['chrF']:.2f} mean={r['human_proxy_mean']} QA={r['qa_issues']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Deterministic stand-in for the Ollama HTTP API (for tests and benchmarks, no model needed).
+
+Serves /api/chat, /api/generate, /api/tags and /api/version. Replies are a fake "translation"
+of the user text into the Unicode block of the target language named in the
+system prompt, so the QA checks in tools/qa_checks.py pass. Latency, token rate
+and the rate of echo / repetition artifacts are configurable; artifacts are
+chosen by a per-request seeded RNG, so a given request always gets the same reply.
+--fail-rate makes a share of model requests answer HTTP 500 (for failover tests).
+
+    python tools/fake_ollama.py --port 11435 --latency 0.2 --token-rate 40 --echo-rate 0.05
+    OLLAMA_HOST=http://127.0.0.1:11435 python translate_gemma.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# first letter of each target script's Unicode block
+SCRIPT_BASE = {
+    'Hindi': 0x0905,
+    'Tamil': 0x0B85,
+    'Telugu': 0x0C05,
+    'Malayalam': 0x0D05,
+    'Kannada': 0x0C85,
+}
+
+
+def fake_translate(text, lang):
+    """Map ASCII letters onto the target script, keeping spaces and punctuation."""
+    base = SCRIPT_BASE.get(lang)
+    if base is None:
+        return text
+    out = []
+    for ch in text:
+        if 'a' <= ch.lower() <= 'z':
+            out.append(chr(base + (ord(ch.lower()) - ord('a')) % 20))
+        else:
+            out.append(ch)
+    return ''.join(out)
+
+
+# the validation retry's minimal prompt: 'Translate only into <lang>: <text>' (no system prompt)
+RETRY_RE = re.compile(r'Translate only into ([^:]+): ', re.S)
+
+
+def target_language(system_prompt):
+    first = (system_prompt or '').split('\n', 1)[0]
+    if first.startswith('Translate to '):
+        return first[len('Translate to '):].rstrip(':').strip()
+    return None
+
+
+class FakeOllama:
+    def __init__(self, latency=0.0, token_rate=0.0, echo_rate=0.0, repeat_rate=0.0, fail_rate=0.0, seed=0):
+        self.latency = latency
+        # generated tokens per second; 0 = generation is instant
+        self.token_rate = token_rate
+        # probability of replying with an instruction echo / a repetition loop
+        self.echo_rate = echo_rate
+        self.repeat_rate = repeat_rate
+        # probability of answering a model request with HTTP 500; drawn per call, not per request content
+        self.fail_rate = fail_rate
+        self.seed = seed
+        self._fail_rng = random.Random(seed)
+        self.failed = 0
+        self.requests = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        # streamed replies the client hung up on (early aborts)
+        self.aborted = 0
+        self._lock = threading.Lock()
+
+    def _rng(self, body):
+        # options are left out: generation budgets vary from run to run, the reply should not
+        key = json.dumps([self.seed, body.get('messages')], sort_keys=True)
+        return random.Random(hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def chat(self, body):
+        messages = body.get('messages') or []
+        system = ''.join(m.get('content', '') for m in messages if m.get('role') == 'system')
+        user = ''.join(m.get('content', '') for m in messages if m.get('role') == 'user')
+        lang = target_language(system)
+        retry = RETRY_RE.match(user)
+        if retry:
+            lang, user = retry.group(1).strip(), user[retry.end():]
+        content = fake_translate(user, lang)
+        rng = self._rng(body)
+        # retries (minimal prompt) are always clean so validation retries converge
+        if not retry and rng.random() < self.echo_rate:
+            content = f'Text: {user}\n{content}'
+        elif not retry and rng.random() < self.repeat_rate:
+            words = content.split()
+            tail = ' '.join(words[-3:]) if words else content
+            content = content + (' ' + tail) * rng.randint(5, 40)
+        num_predict = (body.get('options') or {}).get('num_predict')
+        eval_tokens = len(content) // 4 + 1
+        # roughly 4 characters per token
+        if num_predict and num_predict > 0 and eval_tokens > num_predict:
+            return content[:num_predict * 4], len(system + user) // 4 + 1, num_predict, 'length'
+        return content, len(system + user) // 4 + 1, eval_tokens, 'stop'
+
+    def should_fail(self):
+        with self._lock:
+            if self.fail_rate and self._fail_rng.random() < self.fail_rate:
+                self.failed += 1
+                return True
+            return False
+
+    def _begin(self):
+        with self._lock:
+            self.requests += 1
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+
+    def _end(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def _final(self, body, elapsed, prompt_tokens, eval_tokens, done_reason='stop'):
+        return {
+            'model': body.get('model', ''),
+            'created_at': '1970-01-01T00:00:00Z',
+            'done': True,
+            'done_reason': done_reason,
+            'total_duration': elapsed,
+            'load_duration': 0,
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': int(self.latency * 1e9),
+            'eval_count': eval_tokens,
+            'eval_duration': max(0, elapsed - int(self.latency * 1e9)),
+        }
+
+    def handle(self, path, body):
+        self._begin()
+        try:
+            t0 = time.perf_counter()
+            if path == '/api/chat':
+                content, prompt_tokens, eval_tokens, done_reason = self.chat(body)
+            else:
+                content, prompt_tokens, eval_tokens, done_reason = '', 1, 0, 'stop'
+            delay = self.latency + (eval_tokens / self.token_rate if self.token_rate else 0.0)
+            if delay:
+                time.sleep(delay)
+            elapsed = int((time.perf_counter() - t0) * 1e9)
+        finally:
+            self._end()
+        resp = self._final(body, elapsed, prompt_tokens, eval_tokens, done_reason)
+        if path == '/api/chat':
+            resp['message'] = {'role': 'assistant', 'content': content}
+        else:
+            resp['response'] = content
+        return resp
+
+    def stream(self, body, write):
+        """Stream a chat reply word by word through `write(dict)`; stops if the client disconnects."""
+        self._begin()
+        try:
+            t0 = time.perf_counter()
+            content, prompt_tokens, eval_tokens, done_reason = self.chat(body)
+            if self.latency:
+                time.sleep(self.latency)
+            pieces = [p for p in content.replace(' ', ' \0').split('\0') if p]
+            for piece in pieces:
+                if self.token_rate:
+                    time.sleep(max(1, len(piece) // 4) / self.token_rate)
+                try:
+                    write({'model': body.get('model', ''), 'created_at': '1970-01-01T00:00:00Z', 'done': False,
+                           'message': {'role': 'assistant', 'content': piece}})
+                except (BrokenPipeError, ConnectionResetError):
+                    with self._lock:
+                        self.aborted += 1
+                    return
+            final = self._final(body, int((time.perf_counter() - t0) * 1e9), prompt_tokens, eval_tokens, done_reason)
+            final['message'] = {'role': 'assistant', 'content': ''}
+            try:
+                write(final)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        finally:
+            self._end()
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, payload):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # the client gave up (e.g. its request timeout expired)
+                self.close_connection = True
+
+        def do_GET(self):
+            if self.path in ('/', '/api/version'):
+                self._send(200, {'version': '0.0.0-fake'})
+            elif self.path == '/api/tags':
+                self._send(200, {'models': [{'name': 'translategemma:4b', 'model': 'translategemma:4b'}]})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if self.path not in ('/api/chat', '/api/generate'):
+                self._send(404, {'error': 'not found'})
+                return
+            if fake.should_fail():
+                self._send(500, {'error': 'fake failure'})
+                return
+            if self.path == '/api/chat' and body.get('stream', True) is not False:
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                def write(obj):
+                    data = (json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8')
+                    self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+                    self.wfile.flush()
+
+                fake.stream(body, write)
+                try:
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                return
+            self._send(200, fake.handle(self.path, body))
+
+    return Handler
+
+
+def serve(host='127.0.0.1', port=11435, **kwargs):
+    """Start a fake server in a background thread; returns (server, fake). Use port=0 for a free port."""
+    fake = FakeOllama(**kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fake Ollama server for tests and benchmarks.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--token-rate', type=float, default=0.0, help='generated tokens per second (0 = instant)')
+    parser.add_argument('--echo-rate', type=float, default=0.0, help='fraction of replies that echo the instruction/source')
+    parser.add_argument('--repeat-rate', type=float, default=0.0, help='fraction of replies with a repetition loop')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of model requests answered with HTTP 500')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    fake = FakeOllama(latency=args.latency, token_rate=args.token_rate, echo_rate=args.echo_rate,
+                      repeat_rate=args.repeat_rate, fail_rate=args.fail_rate, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    server.daemon_threads = True
+    print(f'Fake Ollama listening on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,35 @@
 #!/usr/bin/env python3
+"""Render one slide + narration video per language from batch_output.json and join them.
+
+Languages are rendered in parallel worker processes (slide, speech synthesis and
+ffmpeg encode per language). Every slide, audio track and per-language video is
+stored under video_out/cache/ by a hash of its inputs, so a re-run only redoes
+languages whose text (or layout / TTS backend) changed. Each worker keeps its
+loaded TTS models and fonts for all the languages it renders.
+
+    python tools/make_video.py [--jobs N] [--no-cache]
+"""
+import argparse
+import functools
 import json
+import os
+import shutil
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
 import sys
 
-try:
-    from TTS.api import TTS
-except Exception:
-    TTS = None
-
-try:
-    from gtts import gTTS
-except Exception:
-    gTTS = None
-
 ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from tools import columnar, profiling
+from tools.score_store import content_hash
+
 OUT = ROOT / 'video_out'
-OUT.mkdir(exist_ok=True)
+CACHE = OUT / 'cache'
+# bump to invalidate cached slides/audio/videos after a rendering change
+RENDER_VERSION = 1
+JOBS = int(os.environ.get('MAKE_VIDEO_JOBS', '0')) or None
 
 # Video size and layout
 WIDTH, HEIGHT = 1920, 1080
@@ -25,6 +37,8 @@ PADDING = 80
 BG = (18, 18, 18)
 TITLE_COLOR = (255, 204, 51)
 TEXT_COLOR = (240, 240, 240)
+TITLE_SIZE, BODY_SIZE = 48, 40
+LINE_SPACING = 8
 
 # Map language name to a TTS model or gTTS language code
 TTS_MODELS = {
@@ -50,11 +64,15 @@ FONTS = {
 }
 
 
-def load_batch_outputs():
-    out_path = ROOT / 'batch_output.json'
-    if not out_path.exists():
+def load_batch_outputs(langs):
+    # batch_output.parquet is used when it is the more recent run; only the `langs` columns are read
+    paths = [p for p in (ROOT / 'batch_output.json', ROOT / 'batch_output.parquet') if p.exists()]
+    if not paths:
         print('batch_output.json not found. Run translate_gemma.py first.')
         sys.exit(1)
+    out_path = max(paths, key=lambda p: p.stat().st_mtime)
+    if columnar.is_columnar(out_path):
+        return columnar.read_outputs(out_path, langs, translated_only=True)
     raw = json.loads(out_path.read_text(encoding='utf8'))
     items = [d for d in raw if d.get('input', {}).get('meta', {}).get('translate', True) is not False]
     return items
@@ -71,62 +89,142 @@ def get_sequence():
     return ['Source', 'Malayalam', 'Kannada', 'Tamil', 'Telugu', 'Hindi']
 
 
-def make_slide(text, lang, index):
-    img = Image.new('RGB', (WIDTH, HEIGHT), BG)
-    draw = ImageDraw.Draw(img)
+# Pillow, Coqui TTS and gTTS are imported by the render workers on first use, so importing
+# this module (tools/cli.py, --help) stays fast and works without them; TTS alone takes seconds
+@functools.lru_cache(maxsize=None)
+def tts_class():
+    """Coqui TTS's TTS class, or None if it is not installed."""
+    try:
+        from TTS.api import TTS
+    except Exception:
+        return None
+    return TTS
+
+
+@functools.lru_cache(maxsize=None)
+def gtts_class():
+    """gTTS, or None if it is not installed."""
+    try:
+        from gtts import gTTS
+    except Exception:
+        return None
+    return gTTS
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(lang, size):
+    """Font for a language, loaded once per process."""
+    from PIL import ImageFont
     font_path = FONTS.get(lang)
     try:
-        font_title = ImageFont.truetype(font_path, 48) if font_path and Path(font_path).exists() else ImageFont.load_default()
-        font_body = ImageFont.truetype(font_path, 40) if font_path and Path(font_path).exists() else ImageFont.load_default()
+        if font_path and Path(font_path).exists():
+            return ImageFont.truetype(font_path, size)
     except Exception:
-        font_title = ImageFont.load_default()
-        font_body = ImageFont.load_default()
+        pass
+    return ImageFont.load_default()
 
-    draw.text((PADDING, PADDING), f"{index+1}. {lang}", fill=TITLE_COLOR, font=font_title)
 
-    max_w = WIDTH - 2 * PADDING
-    y = PADDING + 90
-    lines = wrap_text(text, font_body, max_w)
-    for ln in lines:
-        draw.text((PADDING, y), ln, fill=TEXT_COLOR, font=font_body)
-        y += font_body.getsize(ln)[1] + 8
+@functools.lru_cache(maxsize=None)
+def load_tts(model_name):
+    """Coqui TTS model, loaded once per process."""
+    return tts_class()(model_name)
+
+
+def text_width(font, text):
+    # getsize was removed in Pillow 10
+    if hasattr(font, 'getlength'):
+        return font.getlength(text)
+    return font.getsize(text)[0]
 
-    out = OUT / f"{index:02d}_{lang}.png"
-    img.save(out)
-    return out
+
+def line_height(font):
+    try:
+        ascent, descent = font.getmetrics()
+        return ascent + descent
+    except AttributeError:
+        return font.getbbox('Ag')[3]
 
 
 def wrap_text(text, font, max_width):
-    words = text.split()
+    """Greedy word wrap; every distinct word is measured once, so this is linear in the text length."""
+    space = text_width(font, ' ')
+    widths = {}
     lines = []
-    cur = ''
-    for w in words:
-        test = (cur + ' ' + w).strip()
-        if font.getsize(test)[0] <= max_width:
-            cur = test
+    cur, cur_w = [], 0.0
+    for w in text.split():
+        if w not in widths:
+            widths[w] = text_width(font, w)
+        test_w = cur_w + space + widths[w] if cur else widths[w]
+        if test_w <= max_width:
+            cur.append(w)
+            cur_w = test_w
         else:
             if cur:
-                lines.append(cur)
-            cur = w
+                lines.append(' '.join(cur))
+            cur, cur_w = [w], widths[w]
     if cur:
-        lines.append(cur)
+        lines.append(' '.join(cur))
     return lines
 
 
-def synth_audio(text, lang):
-    out = OUT / f"{lang}.wav"
-    if TTS and (lang in TTS_MODELS):
+def slide_key(text, lang, index):
+    layout = (WIDTH, HEIGHT, PADDING, BG, TITLE_COLOR, TEXT_COLOR, TITLE_SIZE, BODY_SIZE, LINE_SPACING)
+    return content_hash('slide', str(RENDER_VERSION), lang, str(index), text, FONTS.get(lang, ''), repr(layout))
+
+
+def audio_key(text, lang):
+    backend = (TTS_MODELS.get(lang, '') if tts_class() else '', GTTS_LANG.get(lang, '') if gtts_class() else '')
+    return content_hash('audio', str(RENDER_VERSION), lang, text, repr(backend))
+
+
+def cached(path, use_cache):
+    return use_cache and path.exists() and path.stat().st_size > 0
+
+
+def tmp_path(path):
+    # keep the suffix: PIL and ffmpeg pick the format from it
+    return path.with_name(f'{path.stem}.{os.getpid()}.tmp{path.suffix}')
+
+
+def make_slide(text, lang, index, out):
+    from PIL import Image, ImageDraw
+    img = Image.new('RGB', (WIDTH, HEIGHT), BG)
+    draw = ImageDraw.Draw(img)
+    font_title = load_font(lang, TITLE_SIZE)
+    font_body = load_font(lang, BODY_SIZE)
+
+    draw.text((PADDING, PADDING), f"{index+1}. {lang}", fill=TITLE_COLOR, font=font_title)
+
+    max_w = WIDTH - 2 * PADDING
+    y = PADDING + 90
+    step = line_height(font_body) + LINE_SPACING
+    for ln in wrap_text(text, font_body, max_w):
+        draw.text((PADDING, y), ln, fill=TEXT_COLOR, font=font_body)
+        y += step
+
+    tmp = tmp_path(out)
+    img.save(tmp)
+    os.replace(tmp, out)
+    return out
+
+
+def synth_audio(text, lang, out):
+    tmp = tmp_path(out)
+    if tts_class() and (lang in TTS_MODELS):
         try:
-            tts = TTS(TTS_MODELS[lang])
-            tts.tts_to_file(text=text, file_path=str(out))
+            tts = load_tts(TTS_MODELS[lang])
+            tts.tts_to_file(text=text, file_path=str(tmp))
+            os.replace(tmp, out)
             return out
         except Exception as e:
             print('TTS model failed for', lang, e)
 
+    gTTS = gtts_class()
     if gTTS and GTTS_LANG.get(lang):
         try:
             t = gTTS(text=text, lang=GTTS_LANG[lang])
-            t.save(str(out))
+            t.save(str(tmp))
+            os.replace(tmp, out)
             return out
         except Exception as e:
             print('gTTS failed for', lang, e)
@@ -134,30 +232,90 @@ def synth_audio(text, lang):
     raise RuntimeError(f'No available TTS for {lang}')
 
 
-def make_video_from_image(img, audio, lang):
-    out = OUT / f"{lang}.mp4"
+def make_video_from_image(img, audio, out):
+    tmp = tmp_path(out)
     cmd = [
-        'ffmpeg', '-y', '-loop', '1', '-i', str(img), '-i', str(audio),
+        'ffmpeg', '-y', '-loglevel', 'error', '-loop', '1', '-i', str(img), '-i', str(audio),
         '-c:v', 'libx264', '-tune', 'stillimage', '-c:a', 'aac',
-        '-b:a', '192k', '-shortest', '-pix_fmt', 'yuv420p', str(out)
+        '-b:a', '192k', '-shortest', '-pix_fmt', 'yuv420p', str(tmp)
     ]
     subprocess.run(cmd, check=True)
+    os.replace(tmp, out)
     return out
 
 
-def concat_videos(videos, out_name='final.mp4'):
+def publish(src, dst):
+    """Expose a cached file under its readable name (hard link, or a copy across filesystems)."""
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+    return dst
+
+
+def render_language(text, lang, index, use_cache=True):
+    """Slide, audio and video for one language; runs in a worker process.
+
+    Returns (cached video, stages redone); the cached file's name is its content hash.
+    """
+    skey, akey = slide_key(text, lang, index), audio_key(text, lang)
+    img = CACHE / f'slide_{skey[:16]}.png'
+    audio = CACHE / f'audio_{akey[:16]}.wav'
+    video = CACHE / f"video_{content_hash(skey, akey)[:16]}.mp4"
+    redone = []
+    if not cached(video, use_cache):
+        if not cached(img, use_cache):
+            make_slide(text, lang, index, img)
+            redone.append('slide')
+        if not cached(audio, use_cache):
+            synth_audio(text, lang, audio)
+            redone.append('audio')
+        make_video_from_image(img, audio, video)
+        redone.append('video')
+    publish(img, OUT / f"{index:02d}_{lang}.png")
+    publish(video, OUT / f"{lang}.mp4")
+    return video, redone
+
+
+def concat_videos(videos, out_name='final.mp4', use_cache=True):
+    """Join the cached per-language videos; skipped when list.txt already names the same files.
+
+    The listing names the cache files, whose names are hashes of their content, so an
+    unchanged listing means unchanged inputs (file times are not used: a hard link
+    keeps the cached file's old mtime).
+    """
     listfile = OUT / 'list.txt'
-    with open(listfile, 'w', encoding='utf8') as f:
-        for v in videos:
-            f.write(f"file '{v.as_posix()}'\n")
-    subprocess.run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', str(listfile), '-c', 'copy', str(OUT / out_name)], check=True)
-    return OUT / out_name
+    listing = ''.join(f"file '{v.as_posix()}'\n" for v in videos)
+    final = OUT / out_name
+    if use_cache and final.exists() and listfile.exists() and listfile.read_text(encoding='utf8') == listing:
+        return final
+    listfile.write_text(listing, encoding='utf8')
+    tmp = tmp_path(final)
+    try:
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', str(listfile),
+                        '-c', 'copy', str(tmp)], check=True)
+    except BaseException:
+        # a failed join must not leave a listing that claims the old final.mp4 is current
+        listfile.unlink()
+        raise
+    os.replace(tmp, final)
+    return final
+
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render per-language slide videos from batch_output.json.')
+    parser.add_argument('--jobs', type=int, default=JOBS,
+                        help='worker processes (MAKE_VIDEO_JOBS; default: one per language, up to CPU count)')
+    parser.add_argument('--no-cache', action='store_true', help='re-render every slide, audio track and video')
+    args = parser.parse_args(argv)
 
-def main():
-    items = load_batch_outputs()
+    CACHE.mkdir(parents=True, exist_ok=True)
     seq = get_sequence()
-    videos = []
+    with profiling.stage('load'):
+        items = load_batch_outputs([lang for lang in seq if lang.lower() not in ('english', 'source')])
+    tasks = []
     for idx, lang in enumerate(seq):
         if lang.lower() in ('english', 'source'):
             continue
@@ -166,14 +324,26 @@ def main():
         if not full:
             print('No text for', lang, '— skipping')
             continue
-        print('Rendering', lang)
-        img = make_slide(full, lang, idx)
-        audio = synth_audio(full, lang)
-        vid = make_video_from_image(img, audio, lang)
+        tasks.append((full, lang, idx))
+
+    jobs = args.jobs or min(len(tasks), os.cpu_count() or 1)
+    use_cache = not args.no_cache
+    with profiling.stage('render'):
+        if jobs <= 1 or len(tasks) <= 1:
+            results = [render_language(*t, use_cache=use_cache) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(render_language, *t, use_cache=use_cache) for t in tasks]
+                results = [f.result() for f in futures]
+
+    videos = []
+    for (_, lang, _), (vid, redone) in zip(tasks, results):
+        print(f"{lang}: {'rendered ' + ', '.join(redone) if redone else 'cached'}")
         videos.append(vid)
 
     if videos:
-        final = concat_videos(videos)
+        with profiling.stage('concat'):
+            final = concat_videos(videos, use_cache=use_cache)
         print('Done ->', final)
     else:
         print('No videos produced')
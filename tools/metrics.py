@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+
+# timing/token fields Ollama returns with every non-streaming chat response
+OLLAMA_FIELDS = ('total_duration', 'load_duration', 'prompt_eval_count', 'prompt_eval_duration',
+                 'eval_count', 'eval_duration', 'done_reason')
+
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKENS_PER_SEC_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def ollama_stats(resp):
+    """Pull the timing/token fields out of a chat response; durations are converted to milliseconds."""
+    out = {}
+    for name in OLLAMA_FIELDS:
+        value = resp.get(name) if resp is not None else None
+        if value is None:
+            continue
+        if name.endswith('_duration'):
+            out[name.replace('_duration', '_ms')] = round(value / 1e6, 3)
+        else:
+            out[name] = value
+    if out.get('eval_count') and out.get('eval_ms'):
+        out['eval_tokens_per_sec'] = round(out['eval_count'] / (out['eval_ms'] / 1000), 2)
+    if out.get('prompt_eval_count') and out.get('prompt_eval_ms'):
+        out['prompt_tokens_per_sec'] = round(out['prompt_eval_count'] / (out['prompt_eval_ms'] / 1000), 2)
+    return out
+
+
+class Registry:
+    """Minimal Prometheus-style counters and histograms with text exposition."""
+
+    def __init__(self):
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.buckets = {}
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, value=1, help=''):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.help.setdefault(name, help)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets, help=''):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.help.setdefault(name, help)
+            self.buckets[name] = buckets
+            h = self.histograms.setdefault(key, [0] * len(buckets) + [0.0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    h[i] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    def render(self):
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f'# HELP {name} {self.help.get(name, "")}')
+                    lines.append(f'# TYPE {name} counter')
+                lines.append(f'{name}{fmt(labels)} {value}')
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f'# HELP {name} {self.help.get(name, "")}')
+                    lines.append(f'# TYPE {name} histogram')
+                for bound, count in zip(self.buckets[name], h):
+                    lines.append(f'{name}_bucket{fmt(labels, [("le", bound)])} {count}')
+                lines.append(f'{name}_bucket{fmt(labels, [("le", "+Inf")])} {h[-1]}')
+                lines.append(f'{name}_sum{fmt(labels)} {round(h[-2], 6)}')
+                lines.append(f'{name}_count{fmt(labels)} {h[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """Per-attempt request metrics: a structured JSONL log plus Prometheus-style aggregates."""
+
+    def __init__(self, log_path=None):
+        self.registry = Registry()
+        self.per_lang = {}
+        self._log = open(log_path, 'a', encoding='utf-8') if log_path else None
+        self._lock = threading.Lock()
+        self._server = None
+
+    def record(self, **fields):
+        fields.setdefault('ts', round(time.time(), 3))
+        lang = fields.get('lang', '')
+        labels = {'lang': lang}
+        reg = self.registry
+        reg.inc('translate_requests_total', dict(labels, attempt=fields.get('attempt', 1),
+                                                 cached=str(bool(fields.get('cached'))).lower()),
+                help='Model requests per language, attempt and cache hit')
+        if fields.get('error'):
+            reg.inc('translate_errors_total', labels, help='Failed model requests')
+        if fields.get('aborted'):
+            reg.inc('translate_aborts_total', dict(labels, reason=fields['aborted']),
+                    help='Streamed generations aborted early')
+        if fields.get('action') == 'retry':
+            reg.inc('translate_retries_total', labels, help='Validation retries')
+        for issue in fields.get('issues') or []:
+            reg.inc('translate_validation_issues_total', dict(labels, issue=issue), help='Validation issues seen')
+        if not fields.get('cached') and not fields.get('error'):
+            if fields.get('prompt_eval_count'):
+                reg.inc('translate_prompt_tokens_total', labels, fields['prompt_eval_count'], help='Prompt tokens evaluated')
+            if fields.get('eval_count'):
+                reg.inc('translate_eval_tokens_total', labels, fields['eval_count'], help='Tokens generated')
+            if fields.get('wall_ms') is not None:
+                reg.observe('translate_request_seconds', labels, fields['wall_ms'] / 1000, SECONDS_BUCKETS,
+                            help='Wall-clock model request time')
+            if fields.get('eval_tokens_per_sec'):
+                reg.observe('translate_eval_tokens_per_second', labels, fields['eval_tokens_per_sec'],
+                            TOKENS_PER_SEC_BUCKETS, help='Generation speed')
+        with self._lock:
+            agg = self.per_lang.setdefault(lang, {'requests': 0, 'cached': 0, 'retries': 0, 'errors': 0,
+                                                  'prompt_ms': 0.0, 'eval_ms': 0.0, 'eval_count': 0})
+            agg['requests'] += 1
+            agg['cached'] += 1 if fields.get('cached') else 0
+            agg['retries'] += 1 if fields.get('action') == 'retry' else 0
+            agg['errors'] += 1 if fields.get('error') else 0
+            if not fields.get('cached'):
+                agg['prompt_ms'] += fields.get('prompt_eval_ms') or 0.0
+                agg['eval_ms'] += fields.get('eval_ms') or 0.0
+                agg['eval_count'] += fields.get('eval_count') or 0
+            if self._log is not None:
+                self._log.write(json.dumps(fields, ensure_ascii=False) + '\n')
+                self._log.flush()
+
+    def summary_lines(self):
+        lines = []
+        with self._lock:
+            for lang, agg in sorted(self.per_lang.items()):
+                tps = agg['eval_count'] / (agg['eval_ms'] / 1000) if agg['eval_ms'] else 0.0
+                lines.append(f"{lang}: {agg['requests']} requests ({agg['cached']} cached, {agg['retries']} retries, "
+                             f"{agg['errors']} errors), prompt {agg['prompt_ms'] / 1000:.2f}s, "
+                             f"generation {agg['eval_ms'] / 1000:.2f}s, {tps:.1f} tokens/s")
+        return lines
+
+    def serve(self, port, host='127.0.0.1'):
+        """Expose /metrics in Prometheus text format from a background thread."""
+        # imported here: most runs never serve metrics
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                data = registry.render().encode('utf-8')
+                self.send_response(200 if self.path.startswith('/metrics') else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
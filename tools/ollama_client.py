@@ -0,0 +1,259 @@
+import threading
+import time
+
+import ollama
+
+from tools.resilience import is_transient
+
+
+class ModelClient:
+    """A single, long-lived Ollama client for one model.
+
+    Wraps `ollama.Client` so every request reuses the same pooled HTTP connection
+    and pins the model in memory with `keep_alive`. Model-load time (reported by
+    Ollama as `load_duration`) is tracked separately from wall-clock request time.
+    """
+
+    def __init__(self, model, host=None, keep_alive=None, timeout=None):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.client = ollama.Client(host=host, timeout=timeout)
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.load_seconds = 0.0
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+
+    def _record(self, resp, elapsed, count=True):
+        load = (resp.get('load_duration') or 0) / 1e9
+        with self._lock:
+            if count:
+                self.requests += 1
+                self.request_seconds += elapsed
+            self.load_seconds += load
+        return load
+
+    def warm_up(self, options=None):
+        """Load the model before the first item (an empty generate request only loads it).
+
+        Pass the num_ctx the requests will use: Ollama reloads the model when it changes.
+        """
+        t0 = time.perf_counter()
+        resp = self.client.generate(model=self.model, prompt='', options=options, keep_alive=self.keep_alive)
+        self.warmup_seconds = time.perf_counter() - t0
+        return self._record(resp, self.warmup_seconds, count=False)
+
+    def chat(self, messages, options=None):
+        t0 = time.perf_counter()
+        resp = self.client.chat(model=self.model, messages=messages, options=options, keep_alive=self.keep_alive)
+        self._record(resp, time.perf_counter() - t0)
+        return resp
+
+    def chat_stream(self, messages, options=None, monitor=None):
+        """Stream a chat reply, aborting as soon as `monitor(chunk)` returns an issue code.
+
+        Returns (content, final_response_or_None, abort_reason_or_None). Aborting
+        closes the stream, which makes Ollama stop generating.
+        """
+        t0 = time.perf_counter()
+        parts = []
+        final = None
+        reason = None
+        stream = self.client.chat(model=self.model, messages=messages, options=options,
+                                  keep_alive=self.keep_alive, stream=True)
+        try:
+            for chunk in stream:
+                piece = (chunk.get('message', {}) or {}).get('content', '') or ''
+                if piece:
+                    parts.append(piece)
+                    if monitor is not None:
+                        reason = monitor(piece)
+                        if reason:
+                            break
+                if chunk.get('done'):
+                    final = chunk
+        finally:
+            stream.close()
+        self._record(final or {}, time.perf_counter() - t0)
+        return ''.join(parts), final, reason
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'request_seconds': round(self.request_seconds, 3),
+                'load_seconds': round(self.load_seconds, 3),
+                'warmup_seconds': None if self.warmup_seconds is None else round(self.warmup_seconds, 3),
+            }
+
+
+# consecutive failed calls after which an endpoint is taken out of rotation
+EJECT_AFTER = 2
+# seconds between health checks of every endpoint
+HEALTH_INTERVAL = 5.0
+
+
+class Endpoint:
+    def __init__(self, host, client):
+        self.host = host
+        self.client = client
+        self.outstanding = 0
+        self.failures = 0
+        self.errors = 0
+        self.ejections = 0
+        self.healthy = True
+
+
+class ClientPool:
+    """Several Ollama hosts serving the same model, behind the ModelClient interface.
+
+    Each request goes to the healthy endpoint with the fewest outstanding requests.
+    A call that raises is retried on another endpoint; an endpoint is ejected after
+    `eject_after` consecutive failures or a failed health check, and re-admitted once
+    a background health check (every `health_interval` seconds) succeeds again.
+    """
+
+    def __init__(self, model, hosts, keep_alive=None, timeout=None, eject_after=EJECT_AFTER,
+                 health_interval=HEALTH_INTERVAL):
+        self.model = model
+        self.endpoints = [Endpoint(h, ModelClient(model, host=h, keep_alive=keep_alive, timeout=timeout))
+                          for h in hosts]
+        self.eject_after = eject_after
+        self.failovers = 0
+        self.warmup_seconds = None
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._checker = None
+        if health_interval:
+            self._checker = threading.Thread(target=self._health_loop, args=(health_interval,), daemon=True)
+            self._checker.start()
+
+    def _acquire(self, tried):
+        with self._lock:
+            untried = [ep for ep in self.endpoints if ep not in tried]
+            # with every endpoint ejected, still try them rather than fail outright
+            candidates = [ep for ep in untried if ep.healthy] or untried
+            if not candidates:
+                return None
+            n = len(self.endpoints)
+            # fewest outstanding requests; ties rotate so idle endpoints share the load
+            ep = min(candidates, key=lambda e: (e.outstanding, (self.endpoints.index(e) - self._next) % n))
+            self._next = (self.endpoints.index(ep) + 1) % n
+            ep.outstanding += 1
+            return ep
+
+    def _release(self, ep, error=None):
+        with self._lock:
+            ep.outstanding -= 1
+            if error is None:
+                ep.failures = 0
+                return
+            ep.failures += 1
+            ep.errors += 1
+            if ep.healthy and ep.failures >= self.eject_after:
+                self._eject(ep, error)
+
+    def _eject(self, ep, error):
+        # caller holds self._lock
+        ep.healthy = False
+        ep.ejections += 1
+        print(f'Endpoint {ep.host} ejected: {error}')
+
+    def _call(self, fn, can_failover=lambda: True):
+        tried = []
+        while True:
+            ep = self._acquire(tried)
+            try:
+                result = fn(ep.client)
+            except Exception as e:
+                if not is_transient(e):
+                    # the endpoint answered; the request itself is bad and would fail on any host
+                    self._release(ep)
+                    raise
+                self._release(ep, e)
+                tried.append(ep)
+                if len(tried) >= len(self.endpoints) or not can_failover():
+                    raise
+                with self._lock:
+                    self.failovers += 1
+                continue
+            self._release(ep)
+            return result
+
+    def check_health(self):
+        """Probe every endpoint once; ejects unreachable ones and re-admits recovered ones."""
+        for ep in self.endpoints:
+            try:
+                ep.client.client.list()
+            except Exception as e:
+                with self._lock:
+                    if ep.healthy:
+                        self._eject(ep, e)
+                continue
+            with self._lock:
+                if not ep.healthy:
+                    ep.healthy = True
+                    ep.failures = 0
+                    print(f'Endpoint {ep.host} re-admitted')
+
+    def _health_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.check_health()
+
+    def warm_up(self, options=None):
+        """Load the model on every endpoint in parallel; endpoints that fail are ejected."""
+        t0 = time.perf_counter()
+        loads = []
+
+        def warm(ep):
+            try:
+                loads.append(ep.client.warm_up(options))
+            except Exception as e:
+                with self._lock:
+                    self._eject(ep, e)
+
+        threads = [threading.Thread(target=warm, args=(ep,)) for ep in self.endpoints]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.warmup_seconds = time.perf_counter() - t0
+        if not loads:
+            raise RuntimeError('no endpoint could load the model')
+        return max(loads)
+
+    def chat(self, messages, options=None):
+        return self._call(lambda c: c.chat(messages, options=options))
+
+    def chat_stream(self, messages, options=None, monitor=None):
+        # a stream that already fed the monitor cannot be replayed on another host
+        started = []
+
+        def watched(chunk):
+            started.append(True)
+            return monitor(chunk) if monitor is not None else None
+
+        return self._call(lambda c: c.chat_stream(messages, options=options, monitor=watched),
+                          can_failover=lambda: not started)
+
+    def stats(self):
+        per_host = [ep.client.stats() for ep in self.endpoints]
+        with self._lock:
+            return {
+                'requests': sum(st['requests'] for st in per_host),
+                'request_seconds': round(sum(st['request_seconds'] for st in per_host), 3),
+                'load_seconds': round(sum(st['load_seconds'] for st in per_host), 3),
+                'warmup_seconds': None if self.warmup_seconds is None else round(self.warmup_seconds, 3),
+                'failovers': self.failovers,
+                'endpoints': [
+                    {'host': ep.host, 'requests': st['requests'], 'errors': ep.errors,
+                     'ejections': ep.ejections, 'healthy': ep.healthy}
+                    for ep, st in zip(self.endpoints, per_host)
+                ],
+            }
+
+    def close(self):
+        self._stop.set()
+        if self._checker is not None:
+            self._checker.join()
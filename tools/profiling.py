@@ -0,0 +1,264 @@
+"""Per-stage timers for a run, with optional cProfile, tracemalloc and a sampled stack dump.
+
+Code marks its stages with
+
+    with profiling.stage('validate'):
+        ...
+
+which costs next to nothing unless a profile is active. Stages nest: a stage's
+self time excludes the stages inside it, so the self column of the summary adds
+up to the instrumented time of every thread. While a profile is active a
+background thread samples the stack of every thread that is inside a stage and
+writes them in the collapsed format of flamegraph.pl / speedscope, with the
+innermost stage as the root frame.
+"""
+import contextlib
+import os
+import sys
+import threading
+import time
+
+# stack sampling interval for the collapsed-stack dump
+SAMPLE_MS = 5
+# allocation sites listed in the tracemalloc summary
+TOP_ALLOCATIONS = 15
+# functions listed in the cProfile summary
+TOP_FUNCTIONS = 20
+
+_NULL = contextlib.nullcontext()
+_active = None
+
+
+def stage(name):
+    """Context manager timing one stage; a no-op when no profile is active."""
+    if _active is None:
+        return _NULL
+    return _active.stage(name)
+
+
+def frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class _Stage:
+    __slots__ = ('prof', 'name', 'stack', 'names', 'frame', 't0')
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.stack, self.names = self.prof._enter()
+        # [time spent in nested stages, traced bytes at entry]
+        self.frame = [0.0, self.prof._traced() if self.prof.memory else 0]
+        self.stack.append(self.frame)
+        self.names.append(self.name)
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.t0
+        allocated = self.prof._traced() - self.frame[1] if self.prof.memory else 0
+        self.stack.pop()
+        self.names.pop()
+        if self.stack:
+            self.stack[-1][0] += elapsed
+        self.prof._record(self.name, elapsed, elapsed - self.frame[0], allocated)
+        return False
+
+
+class Profiler:
+    """Stage timings (calls, total, self and max time; net allocations with tracemalloc) for every thread.
+
+    Allocations are traced process-wide, so a stage's net KiB includes what other threads
+    allocated meanwhile; with --concurrency 1 it is that stage's own.
+    """
+
+    def __init__(self, cprofile=False, memory=False, sample_ms=SAMPLE_MS):
+        self.cprofile = cprofile
+        self.memory = memory
+        self.sample_ms = sample_ms
+        # stage -> [calls, total s, self s, max s, net bytes]
+        self.stats = {}
+        # thread id -> stage names it is inside (read by the sampler)
+        self.stacks = {}
+        # collapsed stack -> samples
+        self.samples = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles = []
+        self._stop = threading.Event()
+        self._sampler = None
+        self._snapshot = None
+        self.started = None
+        self.wall = 0.0
+
+    def start(self):
+        if self.sample_ms > 0:
+            # started first so cProfile does not follow it
+            self._sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+            self._sampler.start()
+        if self.memory:
+            import tracemalloc
+            tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot()
+        if self.cprofile:
+            import cProfile
+            main = cProfile.Profile()
+            self._profiles.append(main)
+
+            def start_thread_profile(frame, event, arg):
+                # runs once in each new thread, then the thread's own profiler takes over
+                prof = cProfile.Profile()
+                try:
+                    prof.enable()
+                except ValueError:
+                    # Python 3.12+ profiles every thread from the one profiler already active
+                    sys.setprofile(None)
+                    return
+                with self._lock:
+                    self._profiles.append(prof)
+
+            threading.setprofile(start_thread_profile)
+            main.enable()
+        self.started = time.perf_counter()
+        return self
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def _enter(self):
+        """This thread's (stage timing stack, stage names); created on its first stage."""
+        local = self._local
+        if not hasattr(local, 'stack'):
+            local.stack = []
+            local.names = self.stacks[threading.get_ident()] = []
+        return local.stack, local.names
+
+    def _record(self, name, elapsed, self_s, allocated):
+        with self._lock:
+            st = self.stats.setdefault(name, [0, 0.0, 0.0, 0.0, 0])
+            st[0] += 1
+            st[1] += elapsed
+            st[2] += self_s
+            st[3] = max(st[3], elapsed)
+            st[4] += allocated
+
+    @staticmethod
+    def _traced():
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[0]
+
+    def _sample(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.sample_ms / 1000):
+            frames = sys._current_frames()
+            for ident, names in list(self.stacks.items()):
+                # the thread may leave its stage while we look
+                current = names[-1:]
+                if ident == me or not current or ident not in frames:
+                    continue
+                labels = []
+                f = frames[ident]
+                while f is not None:
+                    labels.append(frame_label(f.f_code))
+                    f = f.f_back
+                labels.append(f'[{current[0]}]')
+                key = ';'.join(reversed(labels))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def stop(self):
+        self.wall = time.perf_counter() - self.started
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        if self.cprofile:
+            threading.setprofile(None)
+            for prof in self._profiles:
+                prof.disable()
+        if self.memory:
+            import tracemalloc
+            self.peak = tracemalloc.get_traced_memory()[1]
+            # the profiler's own bookkeeping is left out
+            ignore = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+            snapshot = tracemalloc.take_snapshot().filter_traces(ignore)
+            self.allocations = snapshot.compare_to(self._snapshot.filter_traces(ignore), 'lineno')[:TOP_ALLOCATIONS]
+            tracemalloc.stop()
+
+    def summary_lines(self):
+        with self._lock:
+            rows = sorted(self.stats.items(), key=lambda kv: kv[1][2], reverse=True)
+        self_total = sum(st[2] for _, st in rows) or 1.0
+        header = f"{'stage':<14} {'calls':>7} {'total s':>9} {'self s':>9} {'self %':>7} {'mean ms':>9} {'max ms':>9}"
+        if self.memory:
+            header += f" {'net KiB':>9}"
+        lines = [f'{self.wall:.2f}s wall', header]
+        for name, (calls, total, self_s, peak, allocated) in rows:
+            line = (f'{name:<14} {calls:>7} {total:>9.3f} {self_s:>9.3f} {100 * self_s / self_total:>6.1f}% '
+                    f'{1000 * total / calls:>9.2f} {1000 * peak:>9.2f}')
+            if self.memory:
+                line += f' {allocated / 1024:>9.1f}'
+            lines.append(line)
+        return lines
+
+    def write(self, prefix):
+        """Write PREFIX.folded (sampled stacks) and PREFIX.pstats (with cProfile); returns the paths written."""
+        written = []
+        if self.samples:
+            path = f'{prefix}.folded'
+            with open(path, 'w', encoding='utf-8') as f:
+                for key, count in sorted(self.samples.items()):
+                    f.write(f'{key} {count}\n')
+            written.append(path)
+        if self.cprofile:
+            path = f'{prefix}.pstats'
+            self.pstats().dump_stats(path)
+            written.append(path)
+        return written
+
+    def pstats(self):
+        import pstats
+        stats = pstats.Stats(self._profiles[0])
+        for prof in self._profiles[1:]:
+            stats.add(prof)
+        return stats
+
+    def report(self, prefix=None):
+        """Print the stage table (and the cProfile / tracemalloc summaries); write the dumps under prefix."""
+        for line in self.summary_lines():
+            print(f'Profile: {line}')
+        if self.cprofile:
+            print(f'Profile: top {TOP_FUNCTIONS} functions by cumulative time')
+            self.pstats().sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        if self.memory:
+            print(f'Profile: peak traced memory {self.peak / 2**20:.1f} MiB; top allocation sites (net):')
+            for diff in self.allocations:
+                frame = diff.traceback[0]
+                print(f'Profile:   {diff.size_diff / 1024:>10.1f} KiB {diff.count_diff:>8} blocks  '
+                      f'{frame.filename}:{frame.lineno}')
+        if prefix:
+            for path in self.write(prefix):
+                print(f'Profile: wrote {path}')
+
+
+def start(cprofile=False, memory=False, sample_ms=SAMPLE_MS):
+    """Start a profile; stages entered from now on, in any thread, are recorded.
+
+    Returns None when a profile is already running (e.g. started by tools/cli.py); it
+    records the caller's stages as well.
+    """
+    global _active
+    if _active is not None:
+        return None
+    _active = Profiler(cprofile, memory, sample_ms).start()
+    return _active
+
+
+def stop(prefix=None):
+    """Stop the active profile, print its report and write its dumps under prefix; returns the Profiler."""
+    global _active
+    prof, _active = _active, None
+    if prof is None:
+        return None
+    prof.stop()
+    prof.report(prefix)
+    return prof
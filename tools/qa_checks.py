@@ -1,5 +1,14 @@
 import re
 import json
+import functools
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from tools import columnar, profiling
+from tools.postprocess import ENGLISH_WORD_RE, PROMPT_LEAKAGE_WORDS
 
 SCRIPTS = {
     "Hindi": r"\u0900-\u097F",
@@ -8,6 +17,13 @@ SCRIPTS = {
     "Malayalam": r"\u0D00-\u0D7F",
     "Kannada": r"\u0C80-\u0CFF"
 }
+SCRIPT_RES = {lang: re.compile(f"[{rng}]") for lang, rng in SCRIPTS.items()}
+# the same ranges as (first, last) code points, for the vectorized checks
+SCRIPT_RANGES = {lang: tuple(int(cp[2:], 16) for cp in rng.split("-")) for lang, rng in SCRIPTS.items()}
+
+# issue codes in the order qa_checks reports them; also the flag columns of qa_batch
+ISSUE_CODES = ("EMPTY_OUTPUT", "ENGLISH_WORDS_PRESENT", "WRONG_SCRIPT", "TOO_SHORT",
+               "DUPLICATED_SEGMENT", "PROMPT_LEAKAGE")
 
 
 def qa_checks(source, translation, lang):
@@ -21,12 +37,12 @@ def qa_checks(source, translation, lang):
     src = str(source or "")
 
     # 2. English leakage
-    if re.search(r"[A-Za-z]{4,}", text):
+    if ENGLISH_WORD_RE.search(text):
         issues.append("ENGLISH_WORDS_PRESENT")
 
     # 3. Wrong script
-    if lang in SCRIPTS:
-        if not re.search(f"[{SCRIPTS[lang]}]", text):
+    if lang in SCRIPT_RES:
+        if not SCRIPT_RES[lang].search(text):
             issues.append("WRONG_SCRIPT")
 
     # 4. Too short
@@ -42,22 +58,149 @@ def qa_checks(source, translation, lang):
         issues.append("DUPLICATED_SEGMENT")
 
     # 6. Instruction leakage
-    bad_words = ["translate", "style", "output", "use formal", "text:"]
-    if any(w.lower() in text.lower() for w in bad_words):
+    lower = text.lower()
+    if any(w in lower for w in PROMPT_LEAKAGE_WORDS):
         issues.append("PROMPT_LEAKAGE")
 
     return issues
 
 
-if __name__ == '__main__':
-    import sys
-    # quick runner: python tools/qa_checks.py batch_output.json
-    if len(sys.argv) < 2:
-        print("Usage: python tools/qa_checks.py <batch_output.json>")
-        sys.exit(1)
-    path = sys.argv[1]
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+@functools.lru_cache(maxsize=None)
+def _whitespace_table():
+    """Boolean lookup of the code points str.strip() removes (all below U+3001); the last entry covers the rest."""
+    import numpy as np
+
+    return np.array([chr(cp).isspace() for cp in range(0x3001)] + [False], dtype=bool)
+
+
+def qa_batch(sources, translations, lang):
+    """Run the QA checks over whole columns of one language at once.
+
+    All translations are joined into one buffer and the checks work on its code
+    point array (per-row counts via segment sums); only the few rows that can
+    fail a text-level check (prompt leakage, duplicated segment) are looked at in
+    Python. Returns a pandas DataFrame with one row per translation: a boolean
+    column per code in ISSUE_CODES (same semantics as qa_checks) plus
+    `script_ratio`, the share of letters in the target script (NaN for languages
+    without a script range).
+    """
+    import numpy as np
+    import pandas as pd
+
+    texts = ["" if t is None else str(t) for t in translations]
+    srcs = ["" if t is None else str(t) for t in sources]
+    if len(srcs) != len(texts):
+        raise ValueError(f"got {len(srcs)} sources for {len(texts)} translations")
+
+    # every row is followed by a NUL, which no check counts as part of a word
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    starts = np.cumsum(lengths + 1) - (lengths + 1)
+    cps = np.frombuffer(("\0".join(texts) + "\0").encode("utf-32-le"), dtype=np.uint32)
+
+    def per_row(mask):
+        if not len(texts):
+            return np.zeros(0, dtype=np.int32)
+        return np.add.reduceat(mask.view(np.uint8), starts, dtype=np.int32)
+
+    ws_table = _whitespace_table()
+    is_latin = ((cps >= 0x41) & (cps <= 0x5A)) | ((cps >= 0x61) & (cps <= 0x7A))
+    latin = per_row(is_latin)
+    # ENGLISH_WORD_RE: a run of 4+ ASCII letters, i.e. a position starting 4 letters in a row
+    run4 = is_latin[:-3] & is_latin[1:-2] & is_latin[2:-1] & is_latin[3:] if len(cps) >= 4 else is_latin[:0]
+    english = per_row(np.concatenate((run4, np.zeros(len(cps) - len(run4), dtype=bool)))) > 0
+    # every leakage word contains 4+ ASCII letters, so only rows with an English word can leak
+    leakage = np.zeros(len(texts), dtype=bool)
+    for i in np.flatnonzero(english):
+        lower = texts[i].lower()
+        leakage[i] = any(w in lower for w in PROMPT_LEAKAGE_WORDS)
+    # a duplicated last segment needs at least two separators
+    sep = "।" if lang == "Hindi" else "."
+    duplicated = np.zeros(len(texts), dtype=bool)
+    for i in np.flatnonzero(per_row(cps == ord(sep)) >= 2):
+        parts = texts[i].split(sep)
+        duplicated[i] = bool(parts[-1].strip()) and parts[-1].strip() == parts[-2].strip()
+
+    flags = pd.DataFrame({
+        # the row's NUL terminator is the only non-whitespace left in an empty output
+        "EMPTY_OUTPUT": per_row(~ws_table[np.minimum(cps, len(ws_table) - 1)]) == 1,
+        "ENGLISH_WORDS_PRESENT": english,
+        "WRONG_SCRIPT": False,
+        "TOO_SHORT": lengths < 0.6 * np.fromiter((len(t) for t in srcs), dtype=np.int64, count=len(srcs)),
+        "DUPLICATED_SEGMENT": duplicated,
+        "PROMPT_LEAKAGE": leakage,
+    })
+    if lang in SCRIPT_RANGES:
+        lo, hi = SCRIPT_RANGES[lang]
+        native = per_row((cps >= lo) & (cps <= hi))
+        letters = native + latin
+        flags["WRONG_SCRIPT"] = native == 0
+        flags["script_ratio"] = np.divide(native, letters, out=np.zeros(len(texts)), where=letters > 0)
+    else:
+        flags["script_ratio"] = np.nan
+    return flags
+
+
+def issue_lists(flags):
+    """Per-row issue code lists (in qa_checks order) from a qa_batch result."""
+    codes = flags[list(ISSUE_CODES)].to_numpy()
+    return [[c for c, hit in zip(ISSUE_CODES, row) if hit] for row in codes]
+
+
+def issue_counts(flags):
+    """Aggregate counts for a qa_batch result: rows, rows with any issue, and rows per issue code."""
+    cols = flags[list(ISSUE_CODES)]
+    out = {"rows": int(len(flags)), "flagged": int(cols.any(axis=1).sum())}
+    out.update({code: int(cols[code].sum()) for code in ISSUE_CODES})
+    return out
+
+
+def translated_entries(data):
+    """Entries without meta.translate == False (kept untranslated on purpose, so not checked)."""
+    return [d for d in data if d.get('input', {}).get('meta', {}).get('translate', True) is not False]
+
+
+def qa_report(data):
+    """Per-language qa_batch flags for a loaded batch_output.json list ({lang: DataFrame})."""
+    data = translated_entries(data)
+    sources = [entry.get('input', {}).get('text', '') for entry in data]
+    langs = []
+    for entry in data:
+        for lang in entry.get('translation', {}):
+            if lang != 'Source' and lang not in langs:
+                langs.append(lang)
+    return {lang: qa_batch(sources, [entry.get('translation', {}).get(lang, '') for entry in data], lang)
+            for lang in langs}
+
+
+def main(argv=None):
+    """Command-line runner; returns the exit status.
+
+        python tools/qa_checks.py batch_output.json
+        python tools/qa_checks.py batch_output.json --summary [--max-issue-rate 0.01]
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv:
+        print("Usage: python tools/qa_checks.py <batch_output.json> [--summary] [--max-issue-rate RATE]")
+        return 1
+    path = argv[0]
+    with profiling.stage('load'):
+        if columnar.is_columnar(path):
+            # source text and language columns only (needs pyarrow)
+            data = columnar.read_outputs(path, translated_only=True)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = translated_entries(json.load(f))
+    if '--summary' in argv or '--max-issue-rate' in argv:
+        # batch mode: aggregate counts per language; exits 1 if any language exceeds the issue rate
+        max_rate = None
+        if '--max-issue-rate' in argv:
+            max_rate = float(argv[argv.index('--max-issue-rate') + 1])
+        with profiling.stage('checks'):
+            summary = {lang: issue_counts(flags) for lang, flags in qa_report(data).items()}
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        if max_rate is not None and any(c['flagged'] > max_rate * c['rows'] for c in summary.values()):
+            return 1
+        return 0
     report = []
     for entry in data:
         src = entry.get('input', {}).get('text','')
@@ -68,3 +211,8 @@ if __name__ == '__main__':
             issues = qa_checks(src, out, lang)
             report.append({'lang': lang, 'issues': issues, 'output_sample': (out[:120] + '...') if out else ''})
     print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+
+import httpx
+import ollama
+
+# HTTP statuses worth retrying: timeouts, rate limiting and server-side failures
+TRANSIENT_STATUS = (408, 429, 500, 502, 503, 504)
+# statuses reported as 'overloaded' rather than 'server_error'
+OVERLOAD_STATUS = (429, 503)
+
+
+def error_status(exc):
+    """Machine-readable status for a failed model call: timeout, unavailable, overloaded, server_error or error."""
+    if isinstance(exc, httpx.TimeoutException):
+        return 'timeout'
+    if isinstance(exc, (ConnectionError, httpx.TransportError)):
+        return 'unavailable'
+    code = getattr(exc, 'status_code', None)
+    if isinstance(exc, ollama.ResponseError) and code in OVERLOAD_STATUS:
+        return 'overloaded'
+    if isinstance(exc, ollama.ResponseError) and code in TRANSIENT_STATUS:
+        return 'server_error'
+    return 'error'
+
+
+def is_transient(exc):
+    return error_status(exc) != 'error'
+
+
+class CallFailed(Exception):
+    """A model call that failed for good, after `attempts` tries; `status` is from error_status."""
+
+    def __init__(self, status, message, attempts):
+        super().__init__(message)
+        self.status = status
+        self.attempts = attempts
+
+    def as_dict(self):
+        return {'status': self.status, 'error': str(self), 'attempts': self.attempts}
+
+
+class CircuitBreaker:
+    """Pauses dispatch while the server is failing.
+
+    After `threshold` consecutive transient failures the breaker opens and callers
+    wait out `cooldown` seconds; then a single trial call is let through (half-open).
+    Its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = 0
+        self._open_until = None
+        self._trial = False
+        self._cond = threading.Condition()
+
+    def before_call(self):
+        with self._cond:
+            while True:
+                if self._open_until is None:
+                    return
+                wait = self._open_until - time.monotonic()
+                if wait <= 0 and not self._trial:
+                    self._trial = True
+                    return
+                self._cond.wait(wait if wait > 0 else None)
+
+    def record(self, ok):
+        with self._cond:
+            if ok:
+                self.failures = 0
+                self._open_until = None
+            else:
+                self.failures += 1
+                if self._trial or (self.threshold and self.failures >= self.threshold):
+                    if self._open_until is None or self._trial:
+                        self.opened += 1
+                        print(f'Circuit breaker open: pausing requests for {self.cooldown:g}s')
+                    self._open_until = time.monotonic() + self.cooldown
+            self._trial = False
+            self._cond.notify_all()
+
+
+class RetryPolicy:
+    """Retries transient failures with exponential backoff and full jitter, behind a circuit breaker."""
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0, breaker=None):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, fn):
+        """Run fn(); raises CallFailed once it fails for good."""
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.breaker is not None:
+                self.breaker.before_call()
+            try:
+                result = fn()
+            except Exception as e:
+                transient = is_transient(e)
+                if self.breaker is not None:
+                    # only failures of the server itself count towards opening the breaker
+                    self.breaker.record(not transient)
+                if not transient or attempt >= self.max_attempts:
+                    raise CallFailed(error_status(e), str(e), attempt) from e
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.delay(attempt))
+                continue
+            if self.breaker is not None:
+                self.breaker.record(True)
+            return result
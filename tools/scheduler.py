@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class LanguageBatcher:
+    """Micro-batching scheduler that groups (item, language) jobs per target language.
+
+    Jobs are queued per language and dispatched as a group once `flush_size` jobs
+    are waiting or the oldest job has waited `max_wait` seconds. A group runs its
+    jobs back to back on one worker, so consecutive model requests share the same
+    system prompt; different languages run in parallel on up to `workers` workers.
+    Each `submit` returns a Future, so results are routed back to their items.
+    """
+
+    def __init__(self, fn, flush_size=8, max_wait=0.05, workers=1):
+        self.fn = fn
+        self.flush_size = max(1, int(flush_size))
+        self.max_wait = max_wait
+        self.pool = ThreadPoolExecutor(max_workers=max(1, int(workers)))
+        self.queues = defaultdict(list)  # lang -> [(enqueued_at, text, future)]
+        self.groups = 0
+        self.jobs = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._timer = threading.Thread(target=self._deadline_loop, daemon=True)
+        self._timer.start()
+
+    def submit(self, lang, text):
+        fut = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('scheduler is closed')
+            queue = self.queues[lang]
+            queue.append((time.monotonic(), text, fut))
+            self.jobs += 1
+            if len(queue) >= self.flush_size:
+                self._flush(lang)
+            else:
+                self._cond.notify()
+        return fut
+
+    def _flush(self, lang):
+        # caller holds self._cond
+        group = self.queues.pop(lang, [])
+        if group:
+            self.groups += 1
+            self.pool.submit(self._run_group, lang, group)
+
+    def _run_group(self, lang, group):
+        for _, text, fut in group:
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(self.fn(text, lang))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def _deadline_loop(self):
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                timeout = None
+                for lang in list(self.queues):
+                    waited = now - self.queues[lang][0][0]
+                    if waited >= self.max_wait:
+                        self._flush(lang)
+                    else:
+                        remaining = self.max_wait - waited
+                        timeout = remaining if timeout is None else min(timeout, remaining)
+                self._cond.wait(timeout)
+
+    def flush_all(self):
+        with self._cond:
+            for lang in list(self.queues):
+                self._flush(lang)
+
+    def close(self):
+        with self._cond:
+            for lang in list(self.queues):
+                self._flush(lang)
+            self._closed = True
+            self._cond.notify_all()
+        self._timer.join()
+        self.pool.shutdown(wait=True)
+
+    def stats(self):
+        with self._cond:
+            return {'jobs': self.jobs, 'groups': self.groups,
+                    'avg_group_size': round(self.jobs / self.groups, 2) if self.groups else 0.0}
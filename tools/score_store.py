@@ -0,0 +1,77 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def content_hash(*parts):
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ScoreStore:
+    """On-disk store of segment-level evaluation results (SQLite).
+
+    Rows are keyed by (item hash, language, reference hash): the item hash covers
+    the source text and the candidate translation, so a segment is only scored
+    again when its output or its reference changes. `signature` names the metric
+    configuration; opening the store with a different one drops every row.
+    """
+
+    def __init__(self, path, signature=''):
+        self.path = str(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS segments ('
+            'item_hash TEXT NOT NULL, lang TEXT NOT NULL, ref_hash TEXT NOT NULL, value TEXT NOT NULL, '
+            'created REAL NOT NULL, PRIMARY KEY (item_hash, lang, ref_hash))'
+        )
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'signature'").fetchone()
+        if row is None or row[0] != signature:
+            self._db.execute('DELETE FROM segments')
+            self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('signature', ?)", (signature,))
+        self._db.commit()
+
+    @staticmethod
+    def make_key(source, candidate, lang, reference):
+        return content_hash(source or '', candidate or ''), lang, content_hash(reference or '')
+
+    def get_many(self, keys):
+        """Stored values for the keys that have one, as {key: value}."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._db.execute(
+                    'SELECT value FROM segments WHERE item_hash = ? AND lang = ? AND ref_hash = ?', key
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[key] = json.loads(row[0])
+        return found
+
+    def put_many(self, entries):
+        """Store {key: value} pairs in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO segments (item_hash, lang, ref_hash, value, created) VALUES (?, ?, ?, ?, ?)',
+                [key + (json.dumps(value, ensure_ascii=False), now) for key, value in entries.items()],
+            )
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM segments').fetchone()[0]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Long-running HTTP front-end for translate_gemma.translate_item.
+
+    python tools/serve.py --port 8080 --concurrency 4
+    curl -s localhost:8080/translate -d '{"item": {"text": "Where is the nearest hospital?"}, "targets": ["Source", "Hindi"]}'
+
+Startup, the ollama import and model warm-up are paid once. Concurrent identical
+requests are coalesced into one translation, and a bounded queue applies
+backpressure (503 + Retry-After when full). GET /health reports queue and model stats.
+Any translate_gemma.py option (cache, keep-alive, document mode, ...) is accepted too.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import translate_gemma
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+MAX_BODY = 1 << 20
+
+
+class TranslateService:
+    """Queue + worker pool around translate_item with in-flight request coalescing."""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.inflight = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.pool.shutdown(wait=False)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item, targets, fut = await self.queue.get()
+            try:
+                result = await loop.run_in_executor(self.pool, translate_gemma.translate_item, item, targets)
+                if not fut.done():
+                    fut.set_result(result)
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    async def translate(self, item, targets):
+        """Translate one item; returns None when the queue is full."""
+        self.requests += 1
+        key = hashlib.sha1(json.dumps([item, targets], ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+        fut = self.inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, targets, fut))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return None
+        self.inflight[key] = fut
+        fut.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(fut)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'queued': self.queue.qsize(),
+            'inflight': len(self.inflight),
+        }
+
+
+async def read_request(reader):
+    """Parse one HTTP/1.1 request; returns (method, path, headers, body) or None on EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode('latin-1').split()
+    if len(parts) < 2:
+        raise ValueError('malformed request line')
+    method, path = parts[0].upper(), parts[1]
+    headers = {}
+    while True:
+        ln = await reader.readline()
+        if ln in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = ln.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+def write_response(writer, code, payload, keep_alive=True, extra_headers=None):
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = [
+        f'HTTP/1.1 {code} {REASONS.get(code, "")}',
+        'Content-Type: application/json; charset=utf-8',
+        f'Content-Length: {len(data)}',
+        'Connection: ' + ('keep-alive' if keep_alive else 'close'),
+    ]
+    for name, value in (extra_headers or {}).items():
+        head.append(f'{name}: {value}')
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+
+
+async def dispatch(service, method, path, body):
+    if path == '/health':
+        return 200, {'status': 'ok', 'model': translate_gemma.model, 'service': service.stats(),
+                     'client': translate_gemma.get_client().stats()}, None
+    if path != '/translate':
+        return 404, {'error': 'not found'}, None
+    if method != 'POST':
+        return 405, {'error': 'use POST'}, None
+    try:
+        req = json.loads(body or b'{}')
+    except ValueError as e:
+        return 400, {'error': f'invalid JSON: {e}'}, None
+    if not isinstance(req, dict):
+        return 400, {'error': 'expected a JSON object'}, None
+    item = req.get('item')
+    if item is None and 'text' in req:
+        item = {'text': req['text']}
+    if not isinstance(item, dict):
+        return 400, {'error': 'missing "item" (or "text")'}, None
+    targets = req.get('targets') or req.get('sequence')
+    if targets is not None and not (isinstance(targets, list) and all(isinstance(t, str) and t for t in targets)):
+        return 400, {'error': '"targets" must be a list of language names'}, None
+    # exactly the requested languages ("Source"/"English" for the source text); none means the default sequence
+    targets = list(dict.fromkeys(targets)) if targets else None
+    translation = await service.translate(item, targets)
+    if translation is None:
+        return 503, {'error': 'queue full, retry later'}, {'Retry-After': '1'}
+    return 200, translate_gemma.output_record(item, translation), None
+
+
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            try:
+                req = await read_request(reader)
+            except OverflowError:
+                write_response(writer, 413, {'error': 'body too large'}, keep_alive=False)
+                break
+            except (ValueError, asyncio.IncompleteReadError):
+                write_response(writer, 400, {'error': 'malformed request'}, keep_alive=False)
+                break
+            if req is None:
+                break
+            method, path, headers, body = req
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            try:
+                code, payload, extra = await dispatch(service, method, path.split('?', 1)[0], body)
+            except Exception as e:
+                code, payload, extra = 500, {'error': str(e)}, None
+            write_response(writer, code, payload, keep_alive=keep_alive, extra_headers=extra)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def run_server(host, port, workers, queue_size, ready=None):
+    service = TranslateService(workers, queue_size)
+    service.start()
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    addr = server.sockets[0].getsockname()
+    print(f'Serving translate_gemma ({translate_gemma.model}) on http://{addr[0]}:{addr[1]}')
+    if ready is not None:
+        ready(addr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP service mode for translate_gemma.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help='max queued translations before new requests get 503 (default %(default)s)')
+    args, rest = parser.parse_known_args(argv)
+    # everything else (cache, keep-alive, concurrency, ...) is a translate_gemma.py option
+    tg_args = translate_gemma.parse_args(rest)
+    translate_gemma.configure(tg_args)
+    try:
+        asyncio.run(run_server(args.host, args.port, translate_gemma.concurrency, args.queue_size))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        translate_gemma.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class TranslationCache:
+    """On-disk, content-addressed cache of raw model responses (SQLite).
+
+    Entries are keyed by a hash of everything that determines the model output:
+    model name, target language, system instruction, user text and decoding options.
+    Eviction is by age (`max_age_days`) and by size (`max_entries`, least recently used first).
+    """
+
+    def __init__(self, path, max_entries=None, max_age_days=None, refresh=False):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        # refresh=True ignores existing entries but still stores new responses
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed)')
+        self._db.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(model, lang, instruction, user_text, options=None):
+        payload = json.dumps(
+            [model, lang, instruction or '', user_text or '', options or {}],
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if self.refresh:
+                self.misses += 1
+                return None
+            row = self._db.execute('SELECT value FROM translations WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute('UPDATE translations SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO translations (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                (key, value, now, now),
+            )
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+
+    def evict(self):
+        """Drop entries older than max_age_days, then the least recently used beyond max_entries."""
+        removed = 0
+        with self._lock:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._db.execute('DELETE FROM translations WHERE created < ?', (cutoff,)).rowcount
+            if self.max_entries is not None:
+                removed += self._db.execute(
+                    'DELETE FROM translations WHERE key IN ('
+                    'SELECT key FROM translations ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                    (max(0, int(self.max_entries)),),
+                ).rowcount
+            self._db.commit()
+        return removed
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
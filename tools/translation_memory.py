@@ -0,0 +1,223 @@
+import json
+import re
+import threading
+
+import numpy as np
+
+from tools import columnar
+
+# MinHash / LSH layout: BANDS bands of ROWS hashes each. Two sources land in the
+# same bucket of at least one band with probability 1 - (1 - J**ROWS)**BANDS for
+# character-trigram Jaccard similarity J (about 0.94 at J=0.8, 0.995 at J=0.9).
+BANDS = 4
+ROWS = 3
+SHINGLE = 3
+# candidates verified per lookup; keeps lookups bounded when a bucket is crowded
+MAX_CANDIDATES = 32
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, _PRIME, size=BANDS * ROWS).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=BANDS * ROWS).astype(np.uint64)
+# odd 64-bit multiplier for hashing trigrams and combining band rows (wraps mod 2**64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Exact-match form of a source: whitespace collapsed, ends stripped."""
+    return _SPACE_RE.sub(' ', text or '').strip()
+
+
+def shingles(norm):
+    s = norm.lower()
+    if len(s) <= SHINGLE:
+        return {s}
+    return {s[i:i + SHINGLE] for i in range(len(s) - SHINGLE + 1)}
+
+
+def similarity(a, b):
+    """Jaccard similarity of two shingle sets."""
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+def band_keys(norms):
+    """BANDS bucket keys per normalized source, MinHashed over character trigrams in one vectorized pass."""
+    # sources shorter than a shingle are padded so they still have one; NUL separates sources
+    texts = [n.lower().replace('\0', '').ljust(SHINGLE, '\x01') for n in norms]
+    c = np.frombuffer('\0'.join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    # code points fit in 21 bits, so a trigram packs into one integer; windows over a NUL are dropped
+    grams = (c[:-2] << np.uint64(42)) | (c[1:-1] << np.uint64(21)) | c[2:]
+    grams = grams[(c[:-2] != 0) & (c[1:-1] != 0) & (c[2:] != 0)]
+    counts = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)) - (SHINGLE - 1)
+    h = (grams * _MIX) >> np.uint64(32)
+    sig = np.minimum.reduceat((_A[:, None] * h[None, :] + _B[:, None]) % _PRIME, np.cumsum(counts) - counts, axis=1)
+    # fold each band's ROWS values (and the band number) into one 64-bit bucket key
+    sig = sig.reshape(BANDS, ROWS, -1)
+    keys = np.arange(BANDS, dtype=np.uint64)[:, None]
+    for r in range(ROWS):
+        keys = keys * _MIX + sig[:, r]
+    return keys.T.tolist()
+
+
+def record_cells(rec):
+    """(source, lang, translation) for the successful cells of one output record."""
+    item = rec.get('input') or {}
+    if not isinstance(item, dict) or (item.get('meta') or {}).get('translate') is False:
+        return
+    source = item.get('text') or item.get('content') or item.get('source')
+    errors = rec.get('errors') or {}
+    for lang, value in (rec.get('translation') or {}).items():
+        if lang == 'Source' or lang in errors or not isinstance(value, str) or value.startswith('ERROR:'):
+            continue
+        yield source, lang, value.strip()
+
+
+class Match:
+    __slots__ = ('source', 'translation', 'score', 'exact')
+
+    def __init__(self, source, translation, score, exact=False):
+        self.source = source
+        self.translation = translation
+        self.score = score
+        self.exact = exact
+
+
+class TranslationMemory:
+    """In-memory translation memory with exact and fuzzy (MinHash LSH) lookup.
+
+    Built from earlier outputs (batch_output.json or JSONL). Exact lookups are a
+    dict probe on the normalized source; fuzzy lookups hash the query's character
+    trigrams into BANDS buckets and verify at most MAX_CANDIDATES entries by
+    Jaccard similarity, so their cost does not grow with the memory size.
+    """
+
+    def __init__(self):
+        self.sources = []
+        # per entry: {lang: translation}
+        self.targets = []
+        self._exact = {}
+        # bucket key -> entry id, or list of ids once a bucket holds several
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.hits = {'exact': 0, 'fuzzy': 0, 'miss': 0}
+
+    def __len__(self):
+        return len(self.sources)
+
+    def add(self, source, lang, translation):
+        """Add or update one (source, language) pair; empty sources or translations are ignored."""
+        self.add_many([(source, lang, translation)])
+
+    def add_many(self, cells, chunk=10000):
+        """Add (source, lang, translation) triples, MinHashing new sources in batches of `chunk`."""
+        batch = []
+        for cell in cells:
+            batch.append(cell)
+            if len(batch) >= chunk:
+                self._add_batch(batch)
+                batch = []
+        if batch:
+            self._add_batch(batch)
+
+    def _add_batch(self, cells):
+        rows = [(normalize(source), lang, translation) for source, lang, translation in cells]
+        rows = [r for r in rows if r[0] and r[2]]
+        with self._lock:
+            new = list(dict.fromkeys(norm for norm, _, _ in rows if norm not in self._exact))
+            keys = dict(zip(new, band_keys(new))) if new else {}
+            for norm, lang, translation in rows:
+                idx = self._exact.get(norm)
+                if idx is not None:
+                    self.targets[idx][lang] = translation
+                    continue
+                idx = len(self.sources)
+                self.sources.append(norm)
+                self.targets.append({lang: translation})
+                self._exact[norm] = idx
+                for key in keys[norm]:
+                    cur = self._buckets.get(key)
+                    if cur is None:
+                        self._buckets[key] = idx
+                    elif isinstance(cur, list):
+                        cur.append(idx)
+                    else:
+                        self._buckets[key] = [cur, idx]
+
+    def load(self, path):
+        """Add every record of an output file (JSON list, JSONL or Parquet); returns the number of records read."""
+        if columnar.is_columnar(path):
+            return self.load_columnar(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            if str(path).endswith('.jsonl'):
+                records = []
+                for ln in f:
+                    try:
+                        records.append(json.loads(ln))
+                    except ValueError:
+                        # blank or partially written line
+                        continue
+            else:
+                records = json.load(f)
+        records = [rec for rec in records if isinstance(rec, dict)]
+        self.add_many(cell for rec in records for cell in record_cells(rec))
+        return len(records)
+
+    def load_columnar(self, path):
+        """Add a Parquet output, reading the source text, language and errors columns only."""
+        langs = [L for L in columnar.languages(path) if L != 'Source']
+        cols = columnar.read_columns(path, ['text', 'errors'] + langs, translated_only=True)
+        failed = [set(json.loads(e)) if e else () for e in cols['errors']]
+        self.add_many((source, L, value.strip())
+                      for L in langs
+                      for source, value, errors in zip(cols['text'], cols[L], failed)
+                      if isinstance(value, str) and L not in errors and not value.startswith('ERROR:'))
+        return len(cols['text'])
+
+    def lookup(self, source, lang, min_score=0.0):
+        """Best entry with a `lang` translation, or None.
+
+        An exact match (after whitespace normalization) has score 1.0; otherwise the most
+        similar LSH candidate whose trigram Jaccard similarity is at least `min_score`.
+        """
+        norm = normalize(source)
+        if not norm:
+            return None
+        with self._lock:
+            idx = self._exact.get(norm)
+            if idx is not None and lang in self.targets[idx]:
+                self.hits['exact'] += 1
+                return Match(self.sources[idx], self.targets[idx][lang], 1.0, exact=True)
+            if not min_score or min_score > 1.0:
+                self.hits['miss'] += 1
+                return None
+            sh = shingles(norm)
+            seen = set()
+            for key in band_keys([norm])[0]:
+                cur = self._buckets.get(key)
+                if cur is None:
+                    continue
+                for i in (cur if isinstance(cur, list) else (cur,)):
+                    if lang in self.targets[i]:
+                        seen.add(i)
+                        if len(seen) >= MAX_CANDIDATES:
+                            break
+                if len(seen) >= MAX_CANDIDATES:
+                    break
+            best, best_score = None, min_score
+            for i in seen:
+                score = similarity(sh, shingles(self.sources[i]))
+                if score >= best_score and (best is None or score > best_score or i < best):
+                    best, best_score = i, score
+            if best is None:
+                self.hits['miss'] += 1
+                return None
+            self.hits['fuzzy'] += 1
+            return Match(self.sources[best], self.targets[best][lang], best_score)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.hits, entries=len(self.sources))
@@ -0,0 +1,176 @@
+import re
+import threading
+
+from tools.qa_checks import SCRIPT_RES, qa_checks
+
+# weight of each issue code towards the retry decision; a translation is retried
+# only when the summed weight of its issues reaches RETRY_THRESHOLD
+ISSUE_WEIGHTS = {
+    'EMPTY_OUTPUT': 1.0,
+    'WRONG_SCRIPT': 1.0,
+    'SOURCE_ECHO': 1.0,
+    'PROMPT_LEAKAGE': 0.6,
+    'INSTRUCTION_MARKERS': 0.5,
+    'TOO_LONG': 0.5,
+    'ENGLISH_WORDS_PRESENT': 0.3,
+    'TOO_SHORT': 0.3,
+    'DUPLICATED_SEGMENT': 0.2,
+    # raised by StreamMonitor when a streamed generation is aborted (REPETITION_LOOP also by
+    # loop_validator: postprocess never collapses repeated whole sentences)
+    'REPETITION_LOOP': 1.0,
+    'LATIN_SCRIPT': 1.0,
+    'LENGTH_RUNAWAY': 1.0,
+}
+RETRY_THRESHOLD = 1.0
+# a retry with any of these is never kept, even when it scores better than the first attempt
+# (an untranslated source echo can outscore a real translation with some leftover English)
+DISQUALIFYING_ISSUES = ('WRONG_SCRIPT', 'SOURCE_ECHO')
+
+# output longer than this multiple of the source length is treated as runaway generation
+MAX_LENGTH_RATIO = 4.0
+
+# streaming early-abort thresholds
+LOOP_MIN_REPEATS = 4       # a phrase repeated this many times back to back is a loop
+LOOP_MAX_PHRASE_WORDS = 12
+LATIN_MIN_LETTERS = 40     # letters seen before judging the script mix
+LATIN_MAX_RATIO = 0.5      # Latin share of letters above which an Indic output is aborted
+LATIN_RE = re.compile(r'[A-Za-z]')
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?\u0964\u0965])\s+')
+
+
+def qa_validator(source, output, lang):
+    """The batch QA checks (script range, English leakage, prompt leakage, too short, duplicates)."""
+    return qa_checks(source, output, lang)
+
+
+def echo_validator(source, output, lang):
+    issues = []
+    # explicit prompt markers from the instruction block
+    if 'text:' in output.lower() or '\n-' in output or '\n•' in output:
+        issues.append('INSTRUCTION_MARKERS')
+    # echoed the source verbatim (strong signal)
+    if source.strip() and source.strip() in output:
+        issues.append('SOURCE_ECHO')
+    return issues
+
+
+def length_validator(source, output, lang):
+    if source and len(output) > MAX_LENGTH_RATIO * len(source):
+        return ['TOO_LONG']
+    return []
+
+
+def sentence_run(text):
+    """Longest run of identical sentences back to back."""
+    best = run = 0
+    prev = None
+    for sentence in SENTENCE_SPLIT_RE.split(text.strip()):
+        key = sentence.strip().casefold()
+        run = run + 1 if key and key == prev else 1
+        prev = key
+        best = max(best, run)
+    return best
+
+
+def loop_validator(source, output, lang):
+    # a sentence repeated back to back more often than anything in the source is a generation loop
+    run = sentence_run(output)
+    if run >= LOOP_MIN_REPEATS and run > sentence_run(source):
+        return ['REPETITION_LOOP']
+    return []
+
+
+# each validator takes (source, output, lang) and returns a list of issue codes;
+# append to this list to plug in extra checks
+VALIDATORS = [qa_validator, echo_validator, length_validator, loop_validator]
+
+
+def validate(source, output, lang, validators=None):
+    """Run every validator and return (score, issues); higher scores are worse."""
+    issues = []
+    for check in (validators if validators is not None else VALIDATORS):
+        for code in check(source or '', output or '', lang):
+            if code not in issues:
+                issues.append(code)
+    score = sum(ISSUE_WEIGHTS.get(code, 0.5) for code in issues)
+    return score, issues
+
+
+def should_retry(score):
+    return score >= RETRY_THRESHOLD
+
+
+def disqualified(issues):
+    return any(code in DISQUALIFYING_ISSUES for code in issues)
+
+
+class StreamMonitor:
+    """Watch a streamed generation and report why it should be aborted early.
+
+    `feed(chunk)` returns None to keep going, or an issue code: REPETITION_LOOP
+    (the tail repeats a short phrase), LATIN_SCRIPT (mostly Latin letters for an
+    Indic target) or LENGTH_RUNAWAY (far beyond the source length ratio).
+    Work per chunk is bounded by the tail window, not the output length.
+    """
+
+    def __init__(self, source, lang):
+        self.max_chars = int(MAX_LENGTH_RATIO * len(source or '')) + 40
+        self.script_re = SCRIPT_RES.get(lang)
+        self.chars = 0
+        self.latin = 0
+        self.native = 0
+        self.words = []
+        self.partial = ''
+
+    def feed(self, chunk):
+        self.chars += len(chunk)
+        if self.chars > self.max_chars:
+            return 'LENGTH_RUNAWAY'
+        if self.script_re is not None:
+            self.latin += len(LATIN_RE.findall(chunk))
+            self.native += len(self.script_re.findall(chunk))
+            letters = self.latin + self.native
+            if letters >= LATIN_MIN_LETTERS and self.latin > LATIN_MAX_RATIO * letters:
+                return 'LATIN_SCRIPT'
+        # only complete words take part in loop detection
+        parts = (self.partial + chunk).split()
+        if not parts:
+            return None
+        if chunk[-1:].isspace():
+            self.partial = ''
+        else:
+            self.partial = parts.pop()
+        if parts:
+            self.words.extend(w.casefold() for w in parts)
+            # keep just enough words to spot the longest loop we look for
+            del self.words[:-LOOP_MIN_REPEATS * LOOP_MAX_PHRASE_WORDS]
+            if self._looping():
+                return 'REPETITION_LOOP'
+        return None
+
+    def _looping(self):
+        w = self.words
+        for k in range(1, LOOP_MAX_PHRASE_WORDS + 1):
+            span = k * LOOP_MIN_REPEATS
+            if len(w) < span:
+                break
+            tail = w[-k:]
+            if all(w[-span + i * k:-span + (i + 1) * k or None] == tail for i in range(LOOP_MIN_REPEATS - 1)):
+                return True
+        return False
+
+
+class RetryBudget:
+    """Thread-safe cap on the number of validation retries in one batch (None = unlimited)."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.limit is not None and self.used >= self.limit:
+                return False
+            self.used += 1
+            return True